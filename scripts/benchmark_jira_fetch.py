@@ -0,0 +1,210 @@
+"""
+Benchmark of paged Jira issue fetching against a local mock Jira server.
+
+Usage (from the repository root):
+
+    python -m scripts.benchmark_jira_fetch --n-issues 5000 --concurrency 1 8
+
+Starts a mock Jira search endpoint which pages results, answers each request
+after a fixed latency and throttles requests above a number in flight with
+429 and a Retry-After header, like Jira Cloud. Fetches a project with
+JiraClient.get_issues_by_project at each concurrency, checks that all issues
+are returned in order and reports the duration, requests and throttled
+requests.
+"""
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from task_whisperer.src.issue_tracking.jira import JiraClient
+
+PROJECT = "BENCH"
+
+
+class MockJira:
+    """Search endpoint state shared by the request handlers"""
+
+    def __init__(
+        self,
+        n_issues: int,
+        max_page_size: int,
+        latency: float,
+        max_in_flight: int,
+        retry_after: float,
+    ) -> None:
+        self.issues = [
+            {
+                "key": f"{PROJECT}-{i}",
+                "fields": {
+                    "summary": f"Issue {i}",
+                    "description": f"Description of issue {i}",
+                    "status": {"name": "Done"},
+                    "project": {"name": PROJECT},
+                    "issuetype": {"name": "Task"},
+                    "updated": "2024-01-01T00:00:00.000+0000",
+                },
+            }
+            for i in range(n_issues)
+        ]
+        self.max_page_size = max_page_size
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.n_requests = 0
+        self.n_throttled = 0
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.n_requests = 0
+            self.n_throttled = 0
+
+    def make_handler(self) -> type:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                if not url.path.endswith("/search"):
+                    self._send(404, {"errorMessages": ["Not found"]})
+                    return
+
+                with mock.lock:
+                    mock.n_requests += 1
+                    throttled = mock.in_flight >= mock.max_in_flight
+                    if throttled:
+                        mock.n_throttled += 1
+                    else:
+                        mock.in_flight += 1
+                if throttled:
+                    self._send(
+                        429,
+                        {"errorMessages": ["Rate limit exceeded"]},
+                        {"Retry-After": str(mock.retry_after)},
+                    )
+                    return
+
+                try:
+                    time.sleep(mock.latency)
+                    params = parse_qs(url.query)
+                    start = int(params.get("startAt", ["0"])[0])
+                    limit = min(
+                        int(params.get("maxResults", ["50"])[0]), mock.max_page_size
+                    )
+                    self._send(
+                        200,
+                        {
+                            "startAt": start,
+                            "maxResults": limit,
+                            "total": len(mock.issues),
+                            "issues": mock.issues[start : start + limit],
+                        },
+                    )
+                finally:
+                    with mock.lock:
+                        mock.in_flight -= 1
+
+            def _send(
+                self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None
+            ) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+
+def time_fetch(
+    client: JiraClient, concurrency: int, repeat: int, n_issues: int
+) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        issues = client.get_issues_by_project(PROJECT, concurrency=concurrency)
+        durations.append(time.perf_counter() - start)
+        assert [issue["key"] for issue in issues] == [
+            f"{PROJECT}-{i}" for i in range(n_issues)
+        ], "issues are missing or out of order"
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--n-issues", type=int, default=5000)
+    parser.add_argument(
+        "--page-size", type=int, default=100, help="maxResults the server allows"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds per search request"
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=4,
+        help="requests in flight above which the server answers 429",
+    )
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    mock = MockJira(
+        args.n_issues,
+        args.page_size,
+        args.latency,
+        args.max_in_flight,
+        args.retry_after,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), mock.make_handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    client = JiraClient(
+        url=f"http://127.0.0.1:{server.server_port}",
+        username="benchmark",
+        password="benchmark",
+        its_config={
+            "cloud": False,
+            "api_options": {
+                "limit": args.page_size,
+                "max_retries": 20,
+                "backoff_factor": args.retry_after,
+            },
+        },
+    )
+
+    n_pages = -(-args.n_issues // args.page_size)
+    print(
+        f"{args.n_issues} issues in {n_pages} pages, {args.latency * 1000:.0f}ms "
+        f"per request, 429 above {args.max_in_flight} requests in flight"
+    )
+    try:
+        for concurrency in args.concurrency:
+            mock.reset_counters()
+            best = min(time_fetch(client, concurrency, args.repeat, args.n_issues))
+            print(
+                f"concurrency {concurrency:>3}: {best:.2f}s, "
+                f"{args.n_issues / best:,.0f} issues/s, "
+                f"{mock.n_requests / args.repeat:.0f} requests and "
+                f"{mock.n_throttled / args.repeat:.0f} throttled per fetch"
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Load test of the Task Whisperer HTTP service.
+
+Usage, with the service running (see the HTTP Service section of README.md):
+
+    python -m scripts.load_test_service --project PROJ \
+        --n-requests 500 --concurrency 32
+
+Sends similar issue searches (or task description requests with
+--endpoint task-descriptions) from concurrent workers and reports latency
+percentiles, throughput and failed requests.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+SUMMARIES = [
+    "Login fails after password reset",
+    "Export to CSV times out for large projects",
+    "Dashboard shows stale data after an update",
+    "Payment service returns 500 on refunds",
+    "Add pagination to the issues endpoint",
+    "Search results ignore the selected project",
+]
+
+
+def get_request_body(
+    endpoint: str, summary: str, n_similar: int, batch_size: int
+) -> Dict[str, Any]:
+    if endpoint == "task-descriptions":
+        return {"summaries": [summary] * batch_size, "n_similar_tasks": n_similar}
+    return {"summary": summary, "n_similar": n_similar}
+
+
+def send_request(
+    url: str, body: Dict[str, Any], timeout: float
+) -> Tuple[float, Optional[str]]:
+    """Latency in seconds and error of a request, None if it succeeded"""
+    request = Request(
+        url,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    start = time.perf_counter()
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            response.read()
+        error = None
+    except HTTPError as e:
+        error = f"HTTP {e.code}"
+    except (URLError, OSError) as e:
+        error = type(e).__name__
+    return time.perf_counter() - start, error
+
+
+def get_percentile(latencies: List[float], percentile: float) -> float:
+    latencies = sorted(latencies)
+    index = round(percentile / 100 * (len(latencies) - 1))
+    return latencies[index]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--project", required=True)
+    parser.add_argument(
+        "--endpoint",
+        choices=("similar-issues", "task-descriptions"),
+        default="similar-issues",
+    )
+    parser.add_argument("--n-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--n-similar", type=int, default=5)
+    parser.add_argument(
+        "--batch-size", type=int, default=1, help="summaries per description request"
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    url = f"{args.url.rstrip('/')}/projects/{args.project}/{args.endpoint}"
+    bodies = [
+        get_request_body(
+            args.endpoint,
+            SUMMARIES[i % len(SUMMARIES)],
+            args.n_similar,
+            args.batch_size,
+        )
+        for i in range(args.n_requests)
+    ]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(
+            executor.map(lambda body: send_request(url, body, args.timeout), bodies)
+        )
+    duration = time.perf_counter() - start
+
+    latencies = [latency for latency, error in results if error is None]
+    errors: Dict[str, int] = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+
+    print(f"{url}: {args.n_requests} requests, concurrency {args.concurrency}")
+    print(
+        f"{len(latencies)} succeeded in {duration:.2f}s, "
+        f"{len(latencies) / duration:.1f} requests/s"
+    )
+    if latencies:
+        print(
+            "latency "
+            + ", ".join(
+                f"p{percentile}: {get_percentile(latencies, percentile) * 1000:.0f}ms"
+                for percentile in (50, 90, 95, 99)
+            )
+            + f", max: {max(latencies) * 1000:.0f}ms"
+        )
+    if errors:
+        print("errors: " + ", ".join(f"{e}: {n}" for e, n in sorted(errors.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Command line interface of Task Whisperer.
+
+Usage:
+
+    python -m task_whisperer.cli generate-descriptions --project PROJ \
+        --input summaries.csv --output descriptions.jsonl
+
+    python -m task_whisperer.cli migrate-datastore --source csv
+
+    python -m task_whisperer.cli refresh-projects --projects PROJ1,PROJ2
+
+    python -m task_whisperer.cli find-duplicates --project PROJ \
+        --output duplicates.csv
+
+    python -m task_whisperer.cli precompute-neighbours --project PROJ --k 10
+"""
+
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+import pandas as pd
+
+from task_whisperer import CONFIG
+from task_whisperer.src.page_helpers.clients import (
+    FAISS_CONFIG,
+    get_vector_store_client,
+)
+from task_whisperer.src.page_helpers.config import get_default_config
+from task_whisperer.src.page_helpers.duplicates import (
+    DUPLICATES_CONFIG,
+    DuplicateService,
+)
+from task_whisperer.src.page_helpers.generate_task_description import (
+    create_task_descriptions,
+)
+from task_whisperer.src.page_helpers.generate_embeddings import (
+    GenerateEmbeddingsService,
+)
+from task_whisperer.src.page_helpers.issues import IssueService
+from task_whisperer.src.page_helpers.pipeline import ProjectPipeline
+
+
+def _read_task_summaries(input_path: str, summary_column: str) -> List[str]:
+    if input_path.endswith(".jsonl"):
+        df = pd.read_json(input_path, lines=True)
+    else:
+        df = pd.read_csv(input_path)
+
+    assert summary_column in df.columns, f"Missing column: {summary_column}"
+    return df[summary_column].fillna("").astype(str).tolist()
+
+
+def generate_descriptions(args: argparse.Namespace) -> None:
+    llm_config = get_default_config("llm_config", args.llm)
+    task_summaries = _read_task_summaries(args.input, args.summary_column)
+
+    with open(args.output, "w") as f:
+        responses = create_task_descriptions(
+            args.llm,
+            llm_config,
+            task_summaries,
+            args.project,
+            max_workers=args.max_workers,
+        )
+        for n_done, (i, response) in enumerate(responses, start=1):
+            callback = response.get("callback")
+            record = {
+                "index": i,
+                "summary": task_summaries[i],
+                "answer": response.get("answer"),
+                "similar_tasks": response.get("similar_tasks", []),
+                "n_tokens": response.get("n_tokens"),
+                "n_saved_tokens": response.get("n_saved_tokens"),
+                "total_tokens": callback.total_tokens if callback else None,
+                "total_cost": callback.total_cost if callback else None,
+                "error": response.get("error"),
+            }
+            # results are written as soon as they are ready
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            print(f"{n_done}/{len(task_summaries)} done", file=sys.stderr)
+
+
+def migrate_datastore(args: argparse.Namespace) -> None:
+    issue_service = IssueService(its_config={}, its_kind=args.its)
+    projects = issue_service.migrate_issues(args.source)
+    print(
+        f"Migrated {len(projects)} project(s) from {args.source} to "
+        f"{issue_service.issue_store.kind}: {', '.join(projects)}",
+        file=sys.stderr,
+    )
+
+
+def refresh_projects(args: argparse.Namespace) -> None:
+    its_config = get_default_config("its_config", args.its)
+    llm_config = get_default_config("llm_config", args.llm)
+    projects = [p for p in (args.projects or its_config["projects"]).split(",") if p]
+
+    pipeline = ProjectPipeline(
+        issue_service=IssueService(its_config, args.its),
+        embeddings_service=GenerateEmbeddingsService(args.llm, args.its, llm_config),
+        max_workers=args.max_workers,
+    )
+    statuses = pipeline.run_all(projects, incremental=args.incremental)
+    for project, status in statuses.items():
+        print(
+            f"{project}: {status.state} ({status.issue_count} issues)"
+            + (f" at {status.stage}: {status.error}" if status.error else ""),
+            file=sys.stderr,
+        )
+
+    if any(status.state == "failed" for status in statuses.values()):
+        sys.exit(1)
+
+
+def find_duplicates(args: argparse.Namespace) -> None:
+    llm_config = get_default_config("llm_config", args.llm)
+    duplicate_service = DuplicateService(args.llm, args.its, llm_config)
+    duplicates_df = duplicate_service.find_duplicates(args.project, args.threshold)
+    duplicates_df.to_csv(args.output, index=False)
+    print(
+        f"{duplicates_df['cluster'].nunique()} cluster(s) of "
+        f"{len(duplicates_df)} duplicate issues written to {args.output}",
+        file=sys.stderr,
+    )
+
+
+def precompute_neighbours(args: argparse.Namespace) -> None:
+    llm_config = get_default_config("llm_config", args.llm)
+    vector_store = get_vector_store_client(args.llm, llm_config)
+    neighbours_path = vector_store.build_neighbours(args.project, args.k)
+    print(f"Neighbours written to {neighbours_path}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="task_whisperer")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate-descriptions",
+        help="Generate task descriptions for summaries in a CSV or JSONL file",
+    )
+    generate_parser.add_argument("--project", required=True)
+    generate_parser.add_argument(
+        "--input", required=True, help="CSV or JSONL file of task summaries"
+    )
+    generate_parser.add_argument(
+        "--output", required=True, help="JSONL file to write the results to"
+    )
+    generate_parser.add_argument("--summary-column", default="summary")
+    generate_parser.add_argument("--llm", default=list(CONFIG["llm_config"].keys())[0])
+    generate_parser.add_argument("--max-workers", type=int, default=8)
+    generate_parser.set_defaults(func=generate_descriptions)
+
+    migrate_parser = subparsers.add_parser(
+        "migrate-datastore",
+        help="Migrate stored issues to the configured issue store",
+    )
+    migrate_parser.add_argument(
+        "--source", default="csv", help="Kind of the issue store to migrate from"
+    )
+    migrate_parser.add_argument("--its", default=list(CONFIG["its_config"].keys())[0])
+    migrate_parser.set_defaults(func=migrate_datastore)
+
+    refresh_parser = subparsers.add_parser(
+        "refresh-projects",
+        help="Fetch, preprocess and embed issues of projects concurrently",
+    )
+    refresh_parser.add_argument(
+        "--projects", help="Comma separated project keys, defaults to the config"
+    )
+    refresh_parser.add_argument("--incremental", action="store_true")
+    refresh_parser.add_argument("--its", default=list(CONFIG["its_config"].keys())[0])
+    refresh_parser.add_argument("--llm", default=list(CONFIG["llm_config"].keys())[0])
+    refresh_parser.add_argument("--max-workers", type=int, default=4)
+    refresh_parser.set_defaults(func=refresh_projects)
+
+    duplicates_parser = subparsers.add_parser(
+        "find-duplicates",
+        help="Find clusters of near-duplicate issues of a project",
+    )
+    duplicates_parser.add_argument("--project", required=True)
+    duplicates_parser.add_argument(
+        "--output", required=True, help="CSV file to write the clusters to"
+    )
+    duplicates_parser.add_argument(
+        "--threshold", type=float, default=DUPLICATES_CONFIG.get("threshold", 0.95)
+    )
+    duplicates_parser.add_argument(
+        "--its", default=list(CONFIG["its_config"].keys())[0]
+    )
+    duplicates_parser.add_argument(
+        "--llm", default=list(CONFIG["llm_config"].keys())[0]
+    )
+    duplicates_parser.set_defaults(func=find_duplicates)
+
+    neighbours_parser = subparsers.add_parser(
+        "precompute-neighbours",
+        help="Save the nearest issues of every issue of a project's embeddings",
+    )
+    neighbours_parser.add_argument("--project", required=True)
+    neighbours_parser.add_argument(
+        "--k", type=int, default=FAISS_CONFIG.get("neighbours", {}).get("k", 10)
+    )
+    neighbours_parser.add_argument(
+        "--llm", default=list(CONFIG["llm_config"].keys())[0]
+    )
+    neighbours_parser.set_defaults(func=precompute_neighbours)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
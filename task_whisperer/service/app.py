@@ -0,0 +1,291 @@
+"""
+Headless HTTP service of Task Whisperer.
+
+Usage:
+
+    uvicorn task_whisperer.service.app:app --host 0.0.0.0 --port 8000
+
+Clients and FAISS indices are created once and reused across requests, the
+number of requests searching or generating at once is bounded by
+service_config.max_concurrency.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from task_whisperer import CONFIG
+from task_whisperer.src.page_helpers.clients import (
+    get_its_client,
+    get_task_generator_client,
+    get_vector_store_client,
+)
+from task_whisperer.src.page_helpers.config import get_default_config
+
+SERVICE_CONFIG = CONFIG.get("service_config", {})
+ITS_KIND = SERVICE_CONFIG.get("its", list(CONFIG["its_config"].keys())[0])
+LLM_KIND = SERVICE_CONFIG.get("llm", list(CONFIG["llm_config"].keys())[0])
+MAX_CONCURRENCY = SERVICE_CONFIG.get("max_concurrency", 16)
+MAX_BATCH_SIZE = SERVICE_CONFIG.get("max_batch_size", 100)
+
+
+class SimilarIssuesRequest(BaseModel):
+    summary: str
+    description: str = ""
+    n_similar: int = Field(5, ge=1, le=50)
+
+
+class MultiProjectSimilarIssuesRequest(SimilarIssuesRequest):
+    # defaults to every configured project
+    projects: Optional[List[str]] = None
+
+
+class SimilarIssuesResponse(BaseModel):
+    similar_issues: List[str]
+    n_tokens: int
+
+
+class TaskDescriptionsRequest(BaseModel):
+    summaries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+    n_similar_tasks: Optional[int] = Field(None, ge=0, le=50)
+    temperature: Optional[float] = Field(None, ge=0.0, le=2.0)
+
+
+class TaskDescription(BaseModel):
+    summary: str
+    answer: Optional[str] = None
+    similar_tasks: List[str] = []
+    n_tokens: Optional[int] = None
+    n_saved_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    total_cost: Optional[float] = None
+    error: Optional[str] = None
+
+
+class TaskDescriptionsResponse(BaseModel):
+    results: List[TaskDescription]
+
+
+class CreateIssueRequest(BaseModel):
+    summary: str
+    description: str
+    extra_fields: Dict[str, Any] = {}
+
+
+class TaskWhispererService:
+    """
+    Serves similar issue search, task description generation and issue
+    creation with clients shared by all requests
+    """
+
+    def __init__(
+        self,
+        its_kind: str = ITS_KIND,
+        llm_kind: str = LLM_KIND,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        assert max_concurrency > 0, "max_concurrency must be positive"
+        self.its_kind = its_kind
+        self.llm_kind = llm_kind
+        self.its_config = get_default_config("its_config", its_kind)
+        self.llm_config = get_default_config("llm_config", llm_kind)
+        self.max_concurrency = max_concurrency
+        # created in the event loop of the app
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @property
+    def vector_store(self):
+        return get_vector_store_client(self.llm_kind, self.llm_config)
+
+    @property
+    def task_generator(self):
+        return get_task_generator_client(self.llm_kind, self.llm_config)
+
+    def get_projects(self) -> List[str]:
+        return [p for p in (self.its_config.get("projects") or "").split(",") if p]
+
+    async def warm_up(self) -> List[str]:
+        """Load indices of the configured projects, return the loaded ones"""
+        loaded = []
+        for project in self.get_projects():
+            # projects without embeddings yet are served once embedded
+            if self.vector_store.has_index(project):
+                await asyncio.to_thread(self.vector_store.read_vector_index, project)
+                loaded.append(project)
+        return loaded
+
+    async def similar_issues(
+        self, project: str, request: SimilarIssuesRequest
+    ) -> SimilarIssuesResponse:
+        async with self.semaphore:
+            similar_issues, n_tokens = await self.vector_store.asimilarity_search(
+                project, request.summary, request.description, request.n_similar
+            )
+        return SimilarIssuesResponse(
+            similar_issues=[doc.page_content for doc in similar_issues],
+            n_tokens=n_tokens,
+        )
+
+    async def similar_issues_by_key(
+        self, project: str, key: str, n_similar: int
+    ) -> SimilarIssuesResponse:
+        """Similar issues of an indexed issue, nothing is embedded"""
+        async with self.semaphore:
+            similar_issues = await asyncio.to_thread(
+                self.vector_store.similar_issues_by_key, project, key, n_similar
+            )
+        return SimilarIssuesResponse(
+            similar_issues=[doc.page_content for doc in similar_issues], n_tokens=0
+        )
+
+    async def similar_issues_multi(
+        self, request: MultiProjectSimilarIssuesRequest
+    ) -> SimilarIssuesResponse:
+        """Similar issues searched in many projects, closest first"""
+        async with self.semaphore:
+            similar_issues, n_tokens = await asyncio.to_thread(
+                self.vector_store.similarity_search_multi,
+                request.projects or self.get_projects(),
+                request.summary,
+                request.description,
+                request.n_similar,
+            )
+        return SimilarIssuesResponse(
+            similar_issues=[doc.page_content for doc in similar_issues],
+            n_tokens=n_tokens,
+        )
+
+    async def _task_description(
+        self, project: str, summary: str, n_similar_tasks: int, temperature: float
+    ) -> TaskDescription:
+        async with self.semaphore:
+            try:
+                response = await self.task_generator.acreate_task_description(
+                    project,
+                    summary,
+                    n_similar_tasks=n_similar_tasks,
+                    temperature=temperature,
+                )
+            except Exception as e:
+                return TaskDescription(summary=summary, error=str(e))
+
+        callback = response["callback"]
+        return TaskDescription(
+            summary=summary,
+            answer=response["answer"],
+            similar_tasks=response["similar_tasks"],
+            n_tokens=response["n_tokens"],
+            n_saved_tokens=response["n_saved_tokens"],
+            total_tokens=callback.total_tokens,
+            total_cost=callback.total_cost,
+        )
+
+    async def task_descriptions(
+        self, project: str, request: TaskDescriptionsRequest
+    ) -> TaskDescriptionsResponse:
+        """
+        Generate task descriptions of a batch of summaries concurrently. A
+        failing summary doesn't fail the batch, its result has an error.
+        """
+        n_similar_tasks = request.n_similar_tasks
+        if n_similar_tasks is None:
+            n_similar_tasks = self.llm_config.get("similar_issues_count", 5)
+        temperature = request.temperature
+        if temperature is None:
+            temperature = self.llm_config.get("llm_temperature", 0)
+
+        results = await asyncio.gather(
+            *(
+                self._task_description(project, summary, n_similar_tasks, temperature)
+                for summary in request.summaries
+            )
+        )
+        return TaskDescriptionsResponse(results=results)
+
+    async def create_issue(
+        self, project: str, request: CreateIssueRequest
+    ) -> Dict[str, Any]:
+        its_client = get_its_client(self.its_kind, self.its_config)
+        return await asyncio.to_thread(
+            its_client.create_issue,
+            project,
+            request.summary,
+            request.description,
+            dict(request.extra_fields),
+        )
+
+
+def create_app(service: Optional[TaskWhispererService] = None) -> FastAPI:
+    service = service or TaskWhispererService()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if SERVICE_CONFIG.get("warm_up", True):
+            await service.warm_up()
+        yield
+
+    app = FastAPI(title="Task Whisperer", lifespan=lifespan)
+    app.state.service = service
+
+    def _assert_indexed(project: str) -> None:
+        if not service.vector_store.has_index(project):
+            raise HTTPException(
+                status_code=404, detail=f"No embeddings for project {project}"
+            )
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "ok"}
+
+    @app.post(
+        "/projects/{project}/similar-issues", response_model=SimilarIssuesResponse
+    )
+    async def similar_issues(project: str, request: SimilarIssuesRequest):
+        _assert_indexed(project)
+        return await service.similar_issues(project, request)
+
+    @app.get(
+        "/projects/{project}/issues/{key}/similar-issues",
+        response_model=SimilarIssuesResponse,
+    )
+    async def similar_issues_by_key(
+        project: str, key: str, n_similar: int = Query(5, ge=1, le=50)
+    ):
+        _assert_indexed(project)
+        try:
+            return await service.similar_issues_by_key(project, key, n_similar)
+        except KeyError:
+            raise HTTPException(
+                status_code=404, detail=f"Issue {key} is not in the embeddings"
+            )
+
+    @app.post("/similar-issues", response_model=SimilarIssuesResponse)
+    async def similar_issues_multi(request: MultiProjectSimilarIssuesRequest):
+        return await service.similar_issues_multi(request)
+
+    @app.post(
+        "/projects/{project}/task-descriptions",
+        response_model=TaskDescriptionsResponse,
+    )
+    async def task_descriptions(project: str, request: TaskDescriptionsRequest):
+        if request.n_similar_tasks != 0:
+            _assert_indexed(project)
+        return await service.task_descriptions(project, request)
+
+    @app.post("/projects/{project}/issues")
+    async def create_issue(project: str, request: CreateIssueRequest):
+        return await service.create_issue(project, request)
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,19 @@
+from .base import BaseIssueStore, BaseIssueWriter
+from .csv_store import CSVIssueStore, CSVIssueWriter
+from .factory import issue_store_factory
+from .migration import migrate_issue_store
+from .parquet_store import ParquetIssueStore, ParquetIssueWriter
+
+issue_store_factory.register("csv", CSVIssueStore)
+issue_store_factory.register("parquet", ParquetIssueStore)
+
+__all__ = [
+    "BaseIssueStore",
+    "BaseIssueWriter",
+    "CSVIssueStore",
+    "CSVIssueWriter",
+    "ParquetIssueStore",
+    "ParquetIssueWriter",
+    "issue_store_factory",
+    "migrate_issue_store",
+]
@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+
+class BaseIssueWriter(ABC):
+    """
+    Appends chunks of issues to a temporary file, which is moved into place
+    on close. Readers keep seeing the previous issues until then, and a failed
+    write leaves them untouched.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.n_rows = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @abstractmethod
+    def write(self, df: pd.DataFrame) -> None:
+        pass
+
+    @abstractmethod
+    def _finish(self) -> None:
+        pass
+
+    def close(self) -> str:
+        self._finish()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        try:
+            self._finish()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def __enter__(self) -> "BaseIssueWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class BaseIssueStore(ABC):
+    """BaseIssueStore"""
+
+    @abstractmethod
+    def __init__(self, root_path: str, its_kind: str, **options) -> None:
+        pass
+
+    @abstractmethod
+    def get_path(self, project: str, processed: bool = False) -> str:
+        pass
+
+    @abstractmethod
+    def save(self, project: str, df: pd.DataFrame, processed: bool = False) -> str:
+        pass
+
+    @abstractmethod
+    def load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def iter_load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[pd.DataFrame]:
+        pass
+
+    @abstractmethod
+    def open_writer(self, project: str, processed: bool = False) -> BaseIssueWriter:
+        pass
+
+    @abstractmethod
+    def list_projects(self) -> List[str]:
+        pass
@@ -0,0 +1,93 @@
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from task_whisperer.src.datastore.base import BaseIssueStore, BaseIssueWriter
+
+RAW_SUFFIX = "_issues.csv"
+PROCESSED_SUFFIX = "_issues_processed.csv"
+
+
+class CSVIssueWriter(BaseIssueWriter):
+    """Appends chunks of issues to a CSV file"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._columns: Optional[List[str]] = None
+        open(self.tmp_path, "w").close()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._columns is None:
+            self._columns = list(df.columns)
+            df.to_csv(self.tmp_path, index=False)
+        else:
+            df.reindex(columns=self._columns).to_csv(
+                self.tmp_path, mode="a", header=False, index=False
+            )
+        self.n_rows += len(df)
+
+    def _finish(self) -> None:
+        pass
+
+
+class CSVIssueStore(BaseIssueStore):
+    """Stores the issues of each project in a raw and a processed CSV file"""
+
+    kind = "csv"
+
+    def __init__(self, root_path: str, its_kind: str, **options) -> None:
+        assert root_path, "root_path is required"
+        assert its_kind, "its_kind is required"
+        self.root_path = os.path.join(root_path, its_kind)
+
+    def get_path(self, project: str, processed: bool = False) -> str:
+        suffix = PROCESSED_SUFFIX if processed else RAW_SUFFIX
+        return os.path.join(self.root_path, f"{project}{suffix}")
+
+    def save(self, project: str, df: pd.DataFrame, processed: bool = False) -> str:
+        with self.open_writer(project, processed) as writer:
+            writer.write(df)
+        return writer.path
+
+    def load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        issues_path = self.get_path(project, processed)
+        if not os.path.exists(issues_path):
+            return pd.DataFrame(columns=columns or [])
+
+        usecols = (lambda column: column in columns) if columns else None
+        return pd.read_csv(issues_path, usecols=usecols)
+
+    def iter_load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[pd.DataFrame]:
+        issues_path = self.get_path(project, processed)
+        if not os.path.exists(issues_path) or not os.path.getsize(issues_path):
+            return
+
+        usecols = (lambda column: column in columns) if columns else None
+        with pd.read_csv(issues_path, usecols=usecols, chunksize=batch_size) as reader:
+            yield from reader
+
+    def open_writer(self, project: str, processed: bool = False) -> CSVIssueWriter:
+        return CSVIssueWriter(self.get_path(project, processed))
+
+    def list_projects(self) -> List[str]:
+        if not os.path.isdir(self.root_path):
+            return []
+
+        return sorted(
+            file_name[: -len(RAW_SUFFIX)]
+            for file_name in os.listdir(self.root_path)
+            if file_name.endswith(RAW_SUFFIX)
+            and not file_name.endswith(PROCESSED_SUFFIX)
+        )
@@ -0,0 +1,27 @@
+from typing import Dict, Type
+
+from task_whisperer.src.datastore.base import BaseIssueStore
+
+
+class IssueStoreFactory:
+    """IssueStoreFactory"""
+
+    def __init__(self):
+        self._issue_stores: Dict[str, BaseIssueStore] = {}
+
+    def register(self, kind: str, issue_store: BaseIssueStore):
+        self._issue_stores[kind] = issue_store
+
+    def get(self, kind: str) -> Type[BaseIssueStore]:
+        klass = self._issue_stores.get(kind)
+        if not klass:
+            raise ValueError(
+                f"{kind} is not a registered IssueStore. "
+                "Registered IssueStore "
+                f"classes are: {list(self._issue_stores.keys())}"
+            )
+
+        return klass
+
+
+issue_store_factory = IssueStoreFactory()
@@ -0,0 +1,37 @@
+from typing import Callable, Dict, Optional
+
+from task_whisperer.src.datastore.base import BaseIssueStore
+
+
+def migrate_issue_store(
+    source: BaseIssueStore,
+    target: BaseIssueStore,
+    on_project_migrated: Optional[Callable[[str, Dict[str, str]], None]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """
+    Copy the raw and processed issues of every project from source to target.
+    Source files are left in place.
+
+    :param source: store to migrate from
+    :type source: BaseIssueStore
+    :param target: store to migrate to
+    :type target: BaseIssueStore
+    :param on_project_migrated: called with the project and its new paths
+        after each project is migrated
+    :type on_project_migrated: Optional[Callable[[str, Dict[str, str]], None]]
+    :return: new raw and processed paths by project
+    :rtype: Dict[str, Dict[str, str]]
+    """
+    migrated = {}
+    for project in source.list_projects():
+        paths = {
+            "raw": target.save(project, source.load(project)),
+            "processed": target.save(
+                project, source.load(project, processed=True), processed=True
+            ),
+        }
+        migrated[project] = paths
+        if on_project_migrated:
+            on_project_migrated(project, paths)
+
+    return migrated
@@ -0,0 +1,166 @@
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from task_whisperer.src.datastore.base import BaseIssueStore, BaseIssueWriter
+
+PARTITION_PREFIX = "project="
+# columns stored with their own type. Every other column, i.e. issue fields
+# such as custom fields whose values are numbers on some issues and text on
+# others, is stored as strings so that all chunks of a file share a schema.
+TYPED_COLUMNS = {"description_len": pa.int64()}
+
+
+def to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert issues to an Arrow table. Columns other than TYPED_COLUMNS are
+    stored as strings, keeping missing values as nulls.
+    """
+    df = df.copy()
+    fields = []
+    for column in df.columns:
+        field_type = TYPED_COLUMNS.get(str(column))
+        if field_type is None:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+            field_type = pa.string()
+        fields.append(pa.field(str(column), field_type))
+
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+class ParquetIssueWriter(BaseIssueWriter):
+    """
+    Appends chunks of issues to a Parquet file, one row group per chunk. The
+    schema is taken from the first chunk, later chunks are cast to it, which
+    can't fail as issue fields are stored as strings (see to_table).
+    """
+
+    def __init__(self, path: str, compression: str = "zstd", **write_options):
+        super().__init__(path)
+        self.compression = compression
+        self.write_options = write_options
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = to_table(df)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(
+                self.tmp_path,
+                table.schema,
+                compression=self.compression,
+                **self.write_options,
+            )
+        else:
+            table = self._conform(table, self._writer.schema)
+        self._writer.write_table(table)
+        self.n_rows += len(df)
+
+    @staticmethod
+    def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+        columns = []
+        for field in schema:
+            if field.name in table.column_names:
+                columns.append(table.column(field.name).cast(field.type))
+            else:
+                columns.append(pa.nulls(len(table), field.type))
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    def _finish(self) -> None:
+        if self._writer is None:
+            # nothing was written, store an empty table
+            pq.write_table(pa.table({}), self.tmp_path)
+        else:
+            self._writer.close()
+            self._writer = None
+
+
+class ParquetIssueStore(BaseIssueStore):
+    """
+    Stores the issues of each project as compressed Parquet files, partitioned
+    by project (<its kind>/project=<project>/raw.parquet and processed.parquet).
+    Text columns are stored as strings, so that the schema isn't re-inferred on
+    every load, and loads only read the requested columns.
+    """
+
+    kind = "parquet"
+
+    def __init__(
+        self,
+        root_path: str,
+        its_kind: str,
+        compression: str = "zstd",
+        compression_level: Optional[int] = None,
+        **options,
+    ) -> None:
+        assert root_path, "root_path is required"
+        assert its_kind, "its_kind is required"
+        self.root_path = os.path.join(root_path, its_kind)
+        self.compression = compression
+        self.compression_level = compression_level
+
+    def get_path(self, project: str, processed: bool = False) -> str:
+        file_name = "processed.parquet" if processed else "raw.parquet"
+        return os.path.join(self.root_path, f"{PARTITION_PREFIX}{project}", file_name)
+
+    def save(self, project: str, df: pd.DataFrame, processed: bool = False) -> str:
+        with self.open_writer(project, processed) as writer:
+            writer.write(df)
+        return writer.path
+
+    def load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        issues_path = self.get_path(project, processed)
+        if not os.path.exists(issues_path):
+            return pd.DataFrame(columns=columns or [])
+
+        if columns:
+            schema_columns = set(pq.read_schema(issues_path).names)
+            columns = [column for column in columns if column in schema_columns]
+        return pq.read_table(issues_path, columns=columns).to_pandas()
+
+    def iter_load(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+        batch_size: int = 10_000,
+    ) -> Iterator[pd.DataFrame]:
+        issues_path = self.get_path(project, processed)
+        if not os.path.exists(issues_path):
+            return
+
+        parquet_file = pq.ParquetFile(issues_path)
+        if columns:
+            columns = [
+                column
+                for column in columns
+                if column in parquet_file.schema_arrow.names
+            ]
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+
+    def open_writer(self, project: str, processed: bool = False) -> ParquetIssueWriter:
+        write_options = {}
+        if self.compression_level is not None:
+            write_options["compression_level"] = self.compression_level
+        return ParquetIssueWriter(
+            self.get_path(project, processed), self.compression, **write_options
+        )
+
+    def list_projects(self) -> List[str]:
+        if not os.path.isdir(self.root_path):
+            return []
+
+        return sorted(
+            dir_name[len(PARTITION_PREFIX) :]
+            for dir_name in os.listdir(self.root_path)
+            if dir_name.startswith(PARTITION_PREFIX)
+            and os.path.exists(os.path.join(self.root_path, dir_name, "raw.parquet"))
+        )
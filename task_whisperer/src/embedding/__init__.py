@@ -1,7 +1,17 @@
 from .base import BaseEmbeddings
+from .cache import EmbeddingCache, get_embedding_cache
 from .factory import embedding_factory
+from .local import LocalEmbeddingGenerator
 from .openai import OpenAIEmbeddingGenerator
 
 embedding_factory.register("openai", OpenAIEmbeddingGenerator)
+embedding_factory.register("local", LocalEmbeddingGenerator)
 
-__all__ = ["BaseEmbeddings", "embedding_factory"]
+__all__ = [
+    "BaseEmbeddings",
+    "EmbeddingCache",
+    "LocalEmbeddingGenerator",
+    "OpenAIEmbeddingGenerator",
+    "embedding_factory",
+    "get_embedding_cache",
+]
@@ -1,11 +1,13 @@
 from abc import ABC, abstractmethod
 import os
-from typing import Any, List, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 from langchain_core.documents import Document
 
 import pandas as pd
 
+from task_whisperer.src.embedding.cache import EmbeddingCache
+
 
 class BaseEmbeddings(ABC):
     """BaseEmbeddings"""
@@ -15,12 +17,20 @@ class BaseEmbeddings(ABC):
         api_key: str,
         faiss_index_root_path: str,
         embedding_model: str,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        batch_options: Optional[Dict[str, Any]] = None,
+        index_options: Optional[Dict[str, Any]] = None,
+        model_options: Optional[Dict[str, Any]] = None,
     ) -> None:
         self.embedder = None
         self.api_key = api_key
         self.embedding_model = embedding_model
         self.faiss_index_root_path = faiss_index_root_path
 
+    @abstractmethod
+    def get_embedding_path(self, project: str) -> str:
+        pass
+
     @abstractmethod
     def load_documents(
         self,
@@ -39,21 +49,50 @@ class BaseEmbeddings(ABC):
 
     @abstractmethod
     def embed_documents(
-        self, project: str, documents: List[Document]
+        self,
+        project: str,
+        documents: List[Document],
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
     ) -> Tuple[str, Any]:
         pass
 
+    @abstractmethod
+    async def aembed_documents(
+        self,
+        project: str,
+        documents: List[Document],
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        pass
+
     @abstractmethod
     def generate_embeddings(
         self,
         project: str,
-        issues_df: pd.DataFrame,
+        issues_df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
         chunk_size: int = 8000,
         summary_col_name: str = "summary",
         description_col_name: str = "description_cleaned",
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        n_issues: Optional[int] = None,
     ) -> Tuple[str, Any]:
         pass
 
     @abstractmethod
     def embed_query(self, query: str) -> List[float]:
         pass
+
+    @abstractmethod
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        pass
+
+    @abstractmethod
+    async def aembed_query(self, query: str) -> List[float]:
+        pass
+
+    @abstractmethod
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        pass
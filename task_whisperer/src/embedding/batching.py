@@ -0,0 +1,239 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import threading
+import time
+from typing import Callable, Deque, List, Optional, Tuple, Type
+
+from langchain_core.embeddings import Embeddings
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+RATE_LIMIT_WINDOW_SECONDS = 60.0
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = ENCODING_NAME) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
+
+
+def get_n_tokens(text: str) -> int:
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def pack_batches(
+    n_tokens: List[int], max_batch_tokens: int, max_batch_size: int
+) -> List[List[int]]:
+    """
+    Pack consecutive texts into batches bounded by token count and size.
+    A text larger than max_batch_tokens gets a batch of its own.
+
+    :param n_tokens: token counts of the texts
+    :type n_tokens: List[int]
+    :param max_batch_tokens: maximum total tokens of a batch
+    :type max_batch_tokens: int
+    :param max_batch_size: maximum number of texts in a batch
+    :type max_batch_size: int
+    :return: batches as lists of text indices
+    :rtype: List[List[int]]
+    """
+    batches = []
+    batch, batch_tokens = [], 0
+    for i, text_tokens in enumerate(n_tokens):
+        if batch and (
+            batch_tokens + text_tokens > max_batch_tokens
+            or len(batch) >= max_batch_size
+        ):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += text_tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class RateLimiter:
+    """Sliding window limiter for tokens per minute and requests per minute"""
+
+    def __init__(self, tokens_per_minute: int, requests_per_minute: int) -> None:
+        assert tokens_per_minute > 0, "tokens_per_minute must be positive"
+        assert requests_per_minute > 0, "requests_per_minute must be positive"
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self._requests: Deque[Tuple[float, int]] = deque()
+        self._n_tokens = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, n_tokens: int) -> float:
+        """Reserve capacity if available, otherwise return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            while (
+                self._requests
+                and now - self._requests[0][0] >= RATE_LIMIT_WINDOW_SECONDS
+            ):
+                self._n_tokens -= self._requests.popleft()[1]
+
+            fits = (
+                len(self._requests) < self.requests_per_minute
+                and self._n_tokens + n_tokens <= self.tokens_per_minute
+            )
+            # a request larger than the whole budget is let through on an
+            # empty window, otherwise it would wait forever
+            if fits or not self._requests:
+                self._requests.append((now, n_tokens))
+                self._n_tokens += n_tokens
+                return 0.0
+
+            return RATE_LIMIT_WINDOW_SECONDS - (now - self._requests[0][0])
+
+    def acquire(self, n_tokens: int) -> None:
+        wait_seconds = self._reserve(n_tokens)
+        while wait_seconds > 0:
+            time.sleep(wait_seconds)
+            wait_seconds = self._reserve(n_tokens)
+
+    async def aacquire(self, n_tokens: int) -> None:
+        wait_seconds = self._reserve(n_tokens)
+        while wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+            wait_seconds = self._reserve(n_tokens)
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter(
+    key: str, tokens_per_minute: int, requests_per_minute: int
+) -> RateLimiter:
+    """Process-wide RateLimiter, shared by all clients using the same quota key"""
+    return RateLimiter(tokens_per_minute, requests_per_minute)
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper which packs texts into token bounded batches and
+    embeds several batches at once within the limits of a RateLimiter.
+    Failed batches are retried on their own.
+    """
+
+    def __init__(
+        self,
+        embedder: Embeddings,
+        rate_limiter: RateLimiter,
+        max_batch_tokens: int = 100_000,
+        max_batch_size: int = 1000,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0,
+        retryable_errors: Tuple[Type[Exception], ...] = (Exception,),
+    ) -> None:
+        self.embedder = embedder
+        self.rate_limiter = rate_limiter
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retryable_errors = retryable_errors
+
+    def _embed_batch(self, texts: List[str], n_tokens: int) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(n_tokens)
+            try:
+                return self.embedder.embed_documents(texts)
+            except self.retryable_errors:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff_factor * (2**attempt))
+
+    def embed_documents(
+        self,
+        texts: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
+        """
+        Embed texts in token-bounded batches, several batches at once.
+
+        :param texts: texts to embed
+        :type texts: List[str]
+        :param progress_callback: called with (n_embedded, n_texts) from the
+            calling thread after each batch. It is passed per call, as the
+            embedder is shared by the threads embedding other projects.
+        :type progress_callback: Optional[Callable[[int, int], None]]
+        :return: vectors of the texts
+        :rtype: List[List[float]]
+        """
+        if not texts:
+            return []
+
+        n_tokens = [get_n_tokens(text) for text in texts]
+        batches = pack_batches(n_tokens, self.max_batch_tokens, self.max_batch_size)
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        n_embedded = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                executor.submit(
+                    self._embed_batch,
+                    [texts[i] for i in batch],
+                    sum(n_tokens[i] for i in batch),
+                ): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                for i, vector in zip(batch, future.result()):
+                    vectors[i] = vector
+
+                n_embedded += len(batch)
+                if progress_callback:
+                    progress_callback(n_embedded, len(texts))
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self.rate_limiter.acquire(get_n_tokens(text))
+        return self.embedder.embed_query(text)
+
+    async def _aembed_batch(
+        self, texts: List[str], n_tokens: int, semaphore: asyncio.Semaphore
+    ) -> List[List[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.rate_limiter.aacquire(n_tokens)
+                try:
+                    return await self.embedder.aembed_documents(texts)
+                except self.retryable_errors:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self.backoff_factor * (2**attempt))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        n_tokens = [get_n_tokens(text) for text in texts]
+        batches = pack_batches(n_tokens, self.max_batch_tokens, self.max_batch_size)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batch_vectors = await asyncio.gather(
+            *(
+                self._aembed_batch(
+                    [texts[i] for i in batch],
+                    sum(n_tokens[i] for i in batch),
+                    semaphore,
+                )
+                for batch in batches
+            )
+        )
+
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, batch_vector in zip(batches, batch_vectors):
+            for i, vector in zip(batch, batch_vector):
+                vectors[i] = vector
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.rate_limiter.aacquire(get_n_tokens(text))
+        return await self.embedder.aembed_query(text)
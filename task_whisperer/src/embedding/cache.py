@@ -0,0 +1,235 @@
+from array import array
+import asyncio
+from functools import lru_cache
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+SQLITE_MAX_VARIABLES = 500
+
+
+class EmbeddingCache:
+    """
+    Content addressed on-disk embedding cache, keyed by embedding model and
+    the hash of the normalized text. Least recently used entries are evicted
+    when the cache grows beyond max_entries.
+    """
+
+    def __init__(self, cache_path: str, max_entries: int = 1_000_000) -> None:
+        assert cache_path, "cache_path is required"
+        assert max_entries > 0, "max_entries must be positive"
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_accessed_at "
+            "ON embeddings (accessed_at)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        normalized = " ".join(text.split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up cached embeddings of texts.
+
+        :param model: embedding model name
+        :type model: str
+        :param texts: texts to look up
+        :type texts: List[str]
+        :return: embeddings in the order of texts, None for the missing ones
+        :rtype: List[Optional[List[float]]]
+        """
+        text_hashes = [self.hash_text(text) for text in texts]
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for i in range(0, len(unique_hashes), SQLITE_MAX_VARIABLES):
+                hash_batch = unique_hashes[i : i + SQLITE_MAX_VARIABLES]
+                placeholders = ",".join("?" * len(hash_batch))
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *hash_batch],
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = array("f", vector).tolist()
+
+            if found:
+                now_ts = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET accessed_at = ? "
+                    "WHERE model = ? AND text_hash = ?",
+                    [(now_ts, model, text_hash) for text_hash in found],
+                )
+                self._conn.commit()
+
+            vectors = [found.get(text_hash) for text_hash in text_hashes]
+            n_hits = sum(vector is not None for vector in vectors)
+            self.hits += n_hits
+            self.misses += len(vectors) - n_hits
+
+        return vectors
+
+    def set_many(
+        self, model: str, texts: List[str], vectors: List[List[float]]
+    ) -> None:
+        now_ts = time.time()
+        rows = [
+            (model, self.hash_text(text), array("f", vector).tobytes(), now_ts)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings "
+                "(model, text_hash, vector, accessed_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._size += max(cursor.rowcount, 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        n_excess = self._size - self.max_entries
+        if n_excess <= 0:
+            return
+
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY accessed_at LIMIT ?)",
+            (n_excess,),
+        )
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        n_requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / n_requests if n_requests else 0.0,
+            "size": self._size,
+            "max_entries": self.max_entries,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache(
+    cache_path: str, max_entries: int = 1_000_000
+) -> EmbeddingCache:
+    """Process-wide EmbeddingCache instance of the given cache path"""
+    return EmbeddingCache(cache_path, max_entries)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper which only embeds texts missing in the cache"""
+
+    def __init__(self, embedder: Embeddings, cache: EmbeddingCache, model: str) -> None:
+        self.embedder = embedder
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(
+        self,
+        texts: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model, texts)
+
+        # duplicate texts are embedded only once
+        missing_texts = {
+            self.cache.hash_text(text): text
+            for text, vector in zip(texts, vectors)
+            if vector is None
+        }
+        if not missing_texts:
+            if progress_callback:
+                progress_callback(len(texts), len(texts))
+            return vectors
+
+        if progress_callback:
+            # cached texts count as embedded
+            n_cached = len(texts) - len(missing_texts)
+            missing_vectors = self.embedder.embed_documents(
+                list(missing_texts.values()),
+                progress_callback=lambda n_embedded, _: progress_callback(
+                    n_cached + n_embedded, len(texts)
+                ),
+            )
+        else:
+            missing_vectors = self.embedder.embed_documents(
+                list(missing_texts.values())
+            )
+        self.cache.set_many(self.model, list(missing_texts.values()), missing_vectors)
+
+        embedded = dict(zip(missing_texts.keys(), missing_vectors))
+        return [
+            vector if vector is not None else embedded[self.cache.hash_text(text)]
+            for text, vector in zip(texts, vectors)
+        ]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get_many(self.model, [text])[0]
+        if vector is None:
+            vector = self.embedder.embed_query(text)
+            self.cache.set_many(self.model, [text], [vector])
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # SQLite lookups are blocking, they run in a worker thread
+        vectors = await asyncio.to_thread(self.cache.get_many, self.model, texts)
+
+        missing_texts = {
+            self.cache.hash_text(text): text
+            for text, vector in zip(texts, vectors)
+            if vector is None
+        }
+        if not missing_texts:
+            return vectors
+
+        missing_vectors = await self.embedder.aembed_documents(
+            list(missing_texts.values())
+        )
+        await asyncio.to_thread(
+            self.cache.set_many,
+            self.model,
+            list(missing_texts.values()),
+            missing_vectors,
+        )
+
+        embedded = dict(zip(missing_texts.keys(), missing_vectors))
+        return [
+            vector if vector is not None else embedded[self.cache.hash_text(text)]
+            for text, vector in zip(texts, vectors)
+        ]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = (await asyncio.to_thread(self.cache.get_many, self.model, [text]))[0]
+        if vector is None:
+            vector = await self.embedder.aembed_query(text)
+            await asyncio.to_thread(self.cache.set_many, self.model, [text], [vector])
+        return vector
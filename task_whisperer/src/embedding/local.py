@@ -0,0 +1,139 @@
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from task_whisperer.src.embedding.cache import CachedEmbeddings, EmbeddingCache
+from task_whisperer.src.embedding.openai import OpenAIEmbeddingGenerator
+
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings of a sentence-transformers model run on the local CPU. The
+    model is loaded on first use, optionally with int8 dynamic quantization
+    of its linear layers.
+    """
+
+    def __init__(
+        self,
+        model_path: str = LOCAL_EMBEDDING_MODEL,
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        quantize: bool = False,
+        normalize: bool = True,
+        device: str = "cpu",
+    ) -> None:
+        assert model_path, "model_path is required"
+        assert batch_size > 0, "batch_size must be positive"
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.quantize = quantize
+        self.normalize = normalize
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self._load_model()
+            return self._model
+
+    def _load_model(self):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "Local embeddings require sentence-transformers, install it "
+                "with: pip install sentence-transformers"
+            ) from e
+
+        if self.num_threads:
+            # torch thread pools are process-wide
+            torch.set_num_threads(self.num_threads)
+
+        model = SentenceTransformer(self.model_path, device=self.device)
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        return model
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_documents(
+        self,
+        texts: List[str],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[List[float]]:
+        vectors = []
+        # a few batches are encoded at once, to report progress in between
+        step = self.batch_size * 8
+        for start in range(0, len(texts), step):
+            vectors.extend(self._encode(texts[start : start + step]))
+            if progress_callback:
+                progress_callback(len(vectors), len(texts))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+
+class LocalEmbeddingGenerator(OpenAIEmbeddingGenerator):
+    """
+    Embedding generator of a local sentence-transformers model. Indexing
+    and incremental updates are shared with OpenAIEmbeddingGenerator, only
+    the embedder differs, so no API key or network access is needed.
+    """
+
+    kind = "local"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        faiss_index_root_path: str,
+        embedding_model: str = LOCAL_EMBEDDING_MODEL,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        batch_options: Optional[Dict[str, Any]] = None,
+        index_options: Optional[Dict[str, Any]] = None,
+        model_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        assert faiss_index_root_path, "faiss_index_root_path is required"
+        assert embedding_model, "embedding_model is required"
+        self.batched_embedder = LocalEmbeddings(
+            embedding_model, **(model_options or {})
+        )
+        self.embedder = self.batched_embedder
+        if embedding_cache is not None:
+            self.embedder = CachedEmbeddings(
+                self.embedder, embedding_cache, embedding_model
+            )
+        self.embedding_model = embedding_model
+        self.faiss_index_root_path = faiss_index_root_path
+        self.index_options = index_options or {}
+
+    def get_embedding_path(self, project: str) -> str:
+        # models may be given as paths, which can't be a part of a file name
+        model_name = re.sub(
+            r"[^\w.-]+", "_", os.path.normpath(self.embedding_model).strip(os.sep)
+        )
+        return os.path.join(
+            self.faiss_index_root_path,
+            self.kind,
+            f"faiss_index_{project}_{model_name}",
+        )
@@ -1,14 +1,32 @@
+import asyncio
+import hashlib
 import os
-from typing import Any, List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 
+import openai
 import pandas as pd
 from langchain_core.documents import Document
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores.faiss import FAISS
 
+from task_whisperer.src.embedding.batching import BatchedEmbeddings, get_rate_limiter
+from task_whisperer.src.embedding.cache import CachedEmbeddings, EmbeddingCache
+from task_whisperer.src.vector_store.faiss_io import (
+    FaissIndexBuilder,
+    delete_from_faiss_index,
+    get_index_type,
+    save_faiss_index,
+)
+
 
 EMBEDDING_MODEL = "text-embedding-ada-002"
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+    openai.RateLimitError,
+)
 
 
 def get_embedder(api_key: str, embedding_model: str = EMBEDDING_MODEL):
@@ -25,13 +43,43 @@ class OpenAIEmbeddingGenerator:
         api_key: str,
         faiss_index_root_path: str,
         embedding_model: str = EMBEDDING_MODEL,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        batch_options: Optional[Dict[str, Any]] = None,
+        index_options: Optional[Dict[str, Any]] = None,
+        model_options: Optional[Dict[str, Any]] = None,
     ) -> None:
         assert api_key, "api_key is required"
         assert faiss_index_root_path, "faiss_index_root_path is required"
         assert embedding_model, "embedding_model is required"
-        self.embedder = get_embedder(api_key, embedding_model)
+        batch_options = dict(batch_options or {})
+        # rate limits are shared by every client using the same key and model
+        rate_limiter = get_rate_limiter(
+            hashlib.sha256(f"{api_key}:{embedding_model}".encode()).hexdigest(),
+            batch_options.pop("tokens_per_minute", 1_000_000),
+            batch_options.pop("requests_per_minute", 3000),
+        )
+        self.batched_embedder = BatchedEmbeddings(
+            get_embedder(api_key, embedding_model),
+            rate_limiter,
+            retryable_errors=RETRYABLE_ERRORS,
+            **batch_options,
+        )
+        self.embedder = self.batched_embedder
+        if embedding_cache is not None:
+            self.embedder = CachedEmbeddings(
+                self.embedder, embedding_cache, embedding_model
+            )
         self.embedding_model = embedding_model
         self.faiss_index_root_path = faiss_index_root_path
+        self.index_options = index_options or {}
+
+    @property
+    def n_neighbours(self) -> int:
+        """Number of nearest issues precomputed per issue when saving an index"""
+        neighbours_options = self.index_options.get("neighbours") or {}
+        if not neighbours_options.get("precompute"):
+            return 0
+        return neighbours_options.get("k", 10)
 
     def load_documents(
         self,
@@ -40,21 +88,21 @@ class OpenAIEmbeddingGenerator:
         summary_col_name: str = "summary",
         description_col_name: str = "description_cleaned",
     ) -> List[Document]:
-        loaded_docs = []
-        for _, row in issues_df.iterrows():
-            doc = Document(
-                page_content=(
-                    f"summary: {row[summary_col_name]}\n"
-                    f"description: {row[description_col_name]}"
-                ),
-                metadata={
-                    "project": project,
-                    "key": row["key"],
-                },
+        page_contents = (
+            "summary: "
+            + issues_df[summary_col_name].astype(str)
+            + "\ndescription: "
+            + issues_df[description_col_name].astype(str)
+        )
+        return [
+            Document(
+                page_content=page_content,
+                metadata={"project": project, "key": key},
             )
-            loaded_docs.append(doc)
-
-        return loaded_docs
+            for page_content, key in zip(
+                page_contents.tolist(), issues_df["key"].tolist()
+            )
+        ]
 
     def split_documents(
         self, documents: List[Document], chunk_size: int = 8000
@@ -63,33 +111,273 @@ class OpenAIEmbeddingGenerator:
         splitted_docs = text_splitter.split_documents(documents)
         return splitted_docs
 
-    def embed_documents(
-        self, project: str, documents: List[Document]
-    ) -> Tuple[str, Any]:
-        embedding_path = os.path.join(
+    def get_embedding_path(self, project: str) -> str:
+        return os.path.join(
             self.faiss_index_root_path,
             self.kind,
             f"faiss_index_{project}_{self.embedding_model}",
         )
-        faiss_db = FAISS.from_documents(documents, self.embedder)
-        faiss_db.save_local(embedding_path)
 
+    @staticmethod
+    def _assign_document_ids(documents: List[Document]) -> List[str]:
+        """
+        Assign stable ids to documents in the form of "<issue key>:<chunk no>",
+        and store a hash of the content in the metadata to detect changes.
+
+        :param documents: splitted documents
+        :type documents: List[Document]
+        :return: document ids, in the order of documents
+        :rtype: List[str]
+        """
+        chunk_counts: Dict[str, int] = {}
+        ids = []
+        for doc in documents:
+            key = doc.metadata["key"]
+            chunk_no = chunk_counts.get(key, 0)
+            chunk_counts[key] = chunk_no + 1
+
+            doc.metadata["content_hash"] = hashlib.sha256(
+                doc.page_content.encode("utf-8")
+            ).hexdigest()
+            ids.append(f"{key}:{chunk_no}")
+
+        return ids
+
+    def _load_index(self, embedding_path: str) -> Optional[FAISS]:
+        if not os.path.exists(os.path.join(embedding_path, "index.faiss")):
+            return None
+
+        faiss_db = FAISS.load_local(embedding_path, self.embedder)
+        # an index of another type than configured is rebuilt
+        if get_index_type(faiss_db.index) != self.index_options.get("index", {}).get(
+            "type", "flat"
+        ):
+            return None
+        return faiss_db
+
+    @staticmethod
+    def _get_indexed_hashes(faiss_db: FAISS) -> Dict[str, Optional[str]]:
+        indexed_hashes = {}
+        for doc_id in faiss_db.index_to_docstore_id.values():
+            indexed_doc = faiss_db.docstore.search(doc_id)
+            if isinstance(indexed_doc, Document):
+                indexed_hashes[doc_id] = indexed_doc.metadata.get("content_hash")
+        return indexed_hashes
+
+    def _update_index(
+        self,
+        faiss_db: FAISS,
+        documents: List[Document],
+        ids: List[str],
+        indexed_hashes: Dict[str, Optional[str]],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """
+        Update an existing index in place with a batch of documents. Vectors
+        of changed documents are replaced, only new or changed documents are
+        embedded.
+
+        :param faiss_db: existing index
+        :type faiss_db: FAISS
+        :param documents: documents which should be in the index
+        :type documents: List[Document]
+        :param ids: stable ids of the documents
+        :type ids: List[str]
+        :param indexed_hashes: content hashes of the indexed documents by id
+        :type indexed_hashes: Dict[str, Optional[str]]
+        :param progress_callback: called with (n_embedded, n_changed) while
+            the changed documents are embedded
+        :type progress_callback: Optional[Callable[[int, int], None]]
+        """
+        changed = [
+            (doc_id, doc)
+            for doc_id, doc in zip(ids, documents)
+            if indexed_hashes.get(doc_id) != doc.metadata["content_hash"]
+        ]
+        if not changed:
+            return
+
+        changed_ids, changed_docs = map(list, zip(*changed))
+        stale_ids = [doc_id for doc_id in changed_ids if doc_id in indexed_hashes]
+        if stale_ids:
+            delete_from_faiss_index(faiss_db, stale_ids)
+        texts = [doc.page_content for doc in changed_docs]
+        faiss_db.add_embeddings(
+            zip(texts, self.embedder.embed_documents(texts, progress_callback)),
+            metadatas=[doc.metadata for doc in changed_docs],
+            ids=changed_ids,
+        )
+
+    def _index_documents(
+        self,
+        project: str,
+        document_batches: Iterable[List[Document]],
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        """
+        Build or incrementally update the index of a project from batches of
+        splitted documents. Only a batch of documents is embedded at once.
+
+        :param project: project key
+        :type project: str
+        :param document_batches: batches of splitted documents
+        :type document_batches: Iterable[List[Document]]
+        :param incremental: update the existing index of the project in place
+        :type incremental: bool
+        :param progress_callback: called with (n_embedded, n_texts) while a
+            batch of documents is embedded
+        :type progress_callback: Optional[Callable[[int, int], None]]
+        :return: path of the saved index
+        :rtype: str
+        """
+        embedding_path = self.get_embedding_path(project)
+        faiss_db = self._load_index(embedding_path) if incremental else None
+
+        if faiss_db is None:
+            builder = FaissIndexBuilder(self.embedder, self.index_options.get("index"))
+            for documents in document_batches:
+                ids = self._assign_document_ids(documents)
+                texts = [doc.page_content for doc in documents]
+                builder.add(
+                    texts,
+                    self.embedder.embed_documents(texts, progress_callback),
+                    [doc.metadata for doc in documents],
+                    ids,
+                )
+            faiss_db = builder.build()
+        else:
+            indexed_hashes = self._get_indexed_hashes(faiss_db)
+            document_ids = set()
+            for documents in document_batches:
+                ids = self._assign_document_ids(documents)
+                document_ids.update(ids)
+                self._update_index(
+                    faiss_db, documents, ids, indexed_hashes, progress_callback
+                )
+
+            # documents of removed issues
+            removed_ids = [
+                doc_id for doc_id in indexed_hashes if doc_id not in document_ids
+            ]
+            if removed_ids:
+                delete_from_faiss_index(faiss_db, removed_ids)
+
+        save_faiss_index(
+            faiss_db,
+            embedding_path,
+            write_docstore=self.index_options.get("mmap"),
+            n_neighbours=self.n_neighbours,
+        )
         return embedding_path
 
+    def embed_documents(
+        self,
+        project: str,
+        documents: List[Document],
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        return self._index_documents(
+            project, [documents], incremental, progress_callback
+        )
+
+    async def aembed_documents(
+        self,
+        project: str,
+        documents: List[Document],
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
+        """
+        Async counterpart of embed_documents. Documents of a new index are
+        embedded with concurrent async requests, while building and saving
+        the index run in a worker thread. Incremental updates embed only the
+        changed documents and run in a worker thread as a whole.
+
+        :return: path of the saved index
+        :rtype: str
+        """
+        if incremental:
+            return await asyncio.to_thread(
+                self.embed_documents, project, documents, True, progress_callback
+            )
+
+        ids = self._assign_document_ids(documents)
+        texts = [doc.page_content for doc in documents]
+        vectors = await self.embedder.aembed_documents(texts)
+        if progress_callback:
+            progress_callback(len(texts), len(texts))
+
+        def _build_and_save() -> str:
+            builder = FaissIndexBuilder(self.embedder, self.index_options.get("index"))
+            builder.add(texts, vectors, [doc.metadata for doc in documents], ids)
+            embedding_path = self.get_embedding_path(project)
+            save_faiss_index(
+                builder.build(),
+                embedding_path,
+                write_docstore=self.index_options.get("mmap"),
+                n_neighbours=self.n_neighbours,
+            )
+            return embedding_path
+
+        return await asyncio.to_thread(_build_and_save)
+
     def generate_embeddings(
         self,
         project: str,
-        issues_df: pd.DataFrame,
+        issues_df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
         chunk_size: int = 8000,
         summary_col_name: str = "summary",
         description_col_name: str = "description_cleaned",
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        n_issues: Optional[int] = None,
     ):
-        docs = self.load_documents(
-            project, issues_df, summary_col_name, description_col_name
-        )
-        splitted_docs = self.split_documents(docs, chunk_size)
-        embedding_path = self.embed_documents(project, splitted_docs)
-        return embedding_path
+        """
+        Generate the index of a project from its processed issues. Issues can
+        be given as batches of DataFrames, e.g. read from the issue store,
+        so that a batch of issues is held in memory at once.
+
+        :param issues_df: processed issues, or batches of them
+        :type issues_df: Union[pd.DataFrame, Iterable[pd.DataFrame]]
+        :param progress_callback: called with (n_indexed, n_issues) after
+            each batch of issues
+        :type progress_callback: Optional[Callable[[int, int], None]]
+        :param n_issues: total number of issues in the batches, used for
+            progress reporting
+        :type n_issues: Optional[int]
+        :return: path of the saved index
+        :rtype: str
+        """
+        if isinstance(issues_df, pd.DataFrame):
+            n_issues = len(issues_df)
+            issues_df = [issues_df]
+
+        def _document_batches() -> Iterator[List[Document]]:
+            n_indexed = 0
+            for issues_batch in issues_df:
+                if issues_batch.empty:
+                    continue
+                docs = self.load_documents(
+                    project, issues_batch, summary_col_name, description_col_name
+                )
+                yield self.split_documents(docs, chunk_size)
+
+                n_indexed += len(issues_batch)
+                if progress_callback and n_issues:
+                    progress_callback(min(n_indexed, n_issues), n_issues)
+
+        return self._index_documents(project, _document_batches(), incremental)
 
     def embed_query(self, query: str) -> List[float]:
         return self.embedder.embed_query(query)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return self.embedder.embed_documents(queries)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        return await self.embedder.aembed_query(query)
+
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        return await self.embedder.aembed_documents(queries)
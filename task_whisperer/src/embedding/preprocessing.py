@@ -1,30 +1,56 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
 import pandas as pd
 import re
 
 VALID_ISSUE_TYPES = ["Task", "Bug"]
 
+# patterns removed from descriptions, extend to add cleaning rules
+CLEANING_PATTERNS = [
+    # accountid mentions [~accountid:xxx]
+    r"\[~accountid:[^\]]+\]",
+    # file attachments [^file.extension]
+    r"\[\^.*?\]",
+    # image attachments !image-xxx.png|width=111,height=111!
+    r"\!image.*?\!",
+]
+
+
+@lru_cache(maxsize=None)
+def compile_patterns(patterns: Tuple[str, ...]) -> re.Pattern:
+    """Combine patterns into one alternation, so text is scanned only once"""
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+
+def clean_description(description: str, patterns: Optional[List[str]] = None) -> str:
+    pattern = compile_patterns(tuple(patterns or CLEANING_PATTERNS))
+    return pattern.sub("", description).strip()
+
 
-def clean_description(description: str) -> str:
-    # remove accountid from text
-    cleaned_text = re.sub(r"\[~accountid:[^\]]+\]", "", description)
-    # remove file attachments [^file.extension]
-    cleaned_text = re.sub(r"\[\^.*?\]", "", description)
-    # remove image attachment !image-xxx.png|width=111,height=111!
-    cleaned_text = re.sub(r"\!image.*?\!", "", description)
-    return cleaned_text.strip()
+def clean_descriptions(
+    descriptions: pd.Series, patterns: Optional[List[str]] = None
+) -> pd.Series:
+    pattern = compile_patterns(tuple(patterns or CLEANING_PATTERNS))
+    return descriptions.astype(str).str.replace(pattern, "", regex=True).str.strip()
 
 
 def preprocess_issues(
     df: pd.DataFrame,
     description_col_name: str = "description",
     description_length_threshold: int = 100,
+    cleaning_patterns: Optional[List[str]] = None,
 ):
     cleaned_col_name = f"{description_col_name}_cleaned"
 
-    df = df[df[description_col_name].notna()]
-    df = df[df["issuetype"].isin(VALID_ISSUE_TYPES)]
+    df = df[df[description_col_name].notna() & df["issuetype"].isin(VALID_ISSUE_TYPES)]
 
-    df[cleaned_col_name] = df[description_col_name].apply(clean_description)
-    df[f"{description_col_name}_len"] = df[cleaned_col_name].str.len()
+    cleaned = clean_descriptions(df[description_col_name], cleaning_patterns)
+    df = df.assign(
+        **{
+            cleaned_col_name: cleaned,
+            f"{description_col_name}_len": cleaned.str.len(),
+        }
+    )
 
     return df[df[f"{description_col_name}_len"] >= description_length_threshold]
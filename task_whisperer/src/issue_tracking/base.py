@@ -1,4 +1,4 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 from abc import ABC, abstractmethod
 
@@ -16,6 +16,18 @@ class BaseITSClient(ABC):
     def get_issues_by_project(self, project: str, **kwargs) -> List[Dict]:
         pass
 
+    @abstractmethod
+    async def aget_issues_by_project(self, project: str, **kwargs) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def iter_issue_pages(self, project: str, **kwargs) -> Iterator[List[Dict]]:
+        pass
+
+    @abstractmethod
+    def get_issue_keys_by_project(self, project: str) -> List[str]:
+        pass
+
     @abstractmethod
     def format_issues(self, issues: List[Dict], **kwargs) -> List[Dict]:
         pass
@@ -1,6 +1,16 @@
-from typing import Any, Dict, List
+import asyncio
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+import itertools
+import time
+from typing import Any, Deque, Dict, Iterator, List, Optional, Union
 
 from atlassian import Jira
+import httpx
+from requests import Response
+from requests.exceptions import HTTPError
 
 from task_whisperer.src.issue_tracking.base import BaseITSClient
 
@@ -14,7 +24,9 @@ class JiraClient(BaseITSClient):
         "status",
         "project",
         "issuetype",
+        "updated",
     ]
+    RETRYABLE_STATUS_CODES = (429, 503)
 
     def __init__(
         self, url: str, username: str, password: str, its_config: Dict, **kwargs
@@ -28,39 +40,259 @@ class JiraClient(BaseITSClient):
             password=password,
             cloud=its_config.get("cloud", True),
         )
+        # the async search endpoint is requested with httpx, the atlassian
+        # client is blocking
+        self.auth = (username, password)
         self.its_config = its_config
         self.issue_fields = self.its_config.get("api_options", {}).get(
             "fields", self.DEFAULT_FIELDS
         )
-        self.api_limit = self.its_config.get("api_options", {}).get("limit", 100)
-
-    def _get_issues_with_jql(self, project: str, start: int = 0) -> Dict:
-        issues = self.jira.jql(
-            f"project = {project}",
-            fields=self.issue_fields,
-            start=start,
-            limit=self.api_limit,
+        api_options = self.its_config.get("api_options", {})
+        self.api_limit = api_options.get("limit", 100)
+        # Jira caps maxResults lower for full issues than for key-only
+        # listings, pages of the size Jira returns are followed either way
+        self.api_keys_limit = api_options.get("keys_limit", 1000)
+        self.api_concurrency = api_options.get("concurrency", 1)
+        self.api_max_retries = api_options.get("max_retries", 5)
+        self.api_backoff_factor = api_options.get("backoff_factor", 1.0)
+        self.incremental_overlap_minutes = api_options.get(
+            "incremental_overlap_minutes", 1440
         )
-        return issues
 
-    def get_issues_by_project(self, project: str) -> List[Dict]:
-        issue_list = []
-        start = 0
+    def _build_jql(self, project: str, updated_since: Optional[str] = None) -> str:
+        jql = f"project = {project}"
+        if updated_since:
+            # JQL dates are interpreted in the timezone of the Jira user, so the
+            # watermark is moved back by an overlap window. Issues fetched twice
+            # are deduplicated by key while merging.
+            since = datetime.fromisoformat(updated_since) - timedelta(
+                minutes=self.incremental_overlap_minutes
+            )
+            jql += f' AND updated >= "{since:%Y-%m-%d %H:%M}"'
+        return jql
+
+    def _get_issues_with_jql(
+        self,
+        jql: str,
+        start: int = 0,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict:
+        for attempt in range(self.api_max_retries + 1):
+            try:
+                return self.jira.jql(
+                    jql,
+                    fields=fields or self.issue_fields,
+                    start=start,
+                    limit=limit or self.api_limit,
+                )
+            except HTTPError as e:
+                status_code = getattr(e.response, "status_code", None)
+                if (
+                    status_code not in self.RETRYABLE_STATUS_CODES
+                    or attempt == self.api_max_retries
+                ):
+                    raise
+                time.sleep(self._get_backoff_seconds(e.response, attempt))
 
-        issues = self._get_issues_with_jql(project, start=start)
-        n_issues_in_batch = issues["maxResults"]
-        issue_list.extend(issues["issues"])
-        n_issues = len(issue_list)
+    async def _aget_issues_with_jql(
+        self,
+        client: httpx.AsyncClient,
+        jql: str,
+        start: int = 0,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Dict:
+        """
+        Async counterpart of _get_issues_with_jql. The search endpoint is
+        requested with httpx, so neither requests nor backoffs hold a thread.
+
+        :raises httpx.HTTPStatusError: on non retryable errors, or when the
+            retries are exhausted
+        """
+        params = {
+            "jql": jql,
+            "fields": ",".join(fields or self.issue_fields),
+            "startAt": start,
+            "maxResults": limit or self.api_limit,
+        }
+        for attempt in range(self.api_max_retries + 1):
+            response = await client.get(self.jira.resource_url("search"), params=params)
+            if (
+                response.status_code in self.RETRYABLE_STATUS_CODES
+                and attempt < self.api_max_retries
+            ):
+                await asyncio.sleep(self._get_backoff_seconds(response, attempt))
+                continue
+            response.raise_for_status()
+            return response.json()
 
-        while n_issues < issues["total"]:
-            start += n_issues_in_batch
-            issues = self._get_issues_with_jql(project, start=start)
-            n_issues_in_batch = issues["maxResults"]
-            issue_list.extend(issues["issues"])
-            n_issues = len(issue_list)
+    def _get_backoff_seconds(
+        self, response: Optional[Union[Response, httpx.Response]], attempt: int
+    ) -> float:
+        """
+        Seconds to wait before retrying a throttled request. Retry-After header
+        is respected when Jira sends it, exponential backoff is used otherwise.
 
+        :param response: response of the failed request
+        :type response: Optional[Union[Response, httpx.Response]]
+        :param attempt: zero based attempt number of the failed request
+        :type attempt: int
+        :return: seconds to wait
+        :rtype: float
+        """
+        # a failed Response is falsy, so it is compared with None
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+            try:
+                retry_at = parsedate_to_datetime(retry_after)
+                return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                # malformed or timezone-less dates fall back to backoff
+                pass
+
+        return self.api_backoff_factor * (2**attempt)
+
+    def get_issues_by_project(
+        self,
+        project: str,
+        concurrency: Optional[int] = None,
+        updated_since: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict]:
+        issue_list = []
+        for page in self.iter_issue_pages(project, concurrency, updated_since, fields):
+            issue_list.extend(page)
         return issue_list
 
+    async def aget_issues_by_project(
+        self,
+        project: str,
+        concurrency: Optional[int] = None,
+        updated_since: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict]:
+        """
+        Async counterpart of get_issues_by_project. Pages after the first
+        one are requested concurrently, at most concurrency at once, over a
+        pool of concurrency connections.
+
+        :param project: project key
+        :type project: str
+        :param concurrency: number of pages requested at once
+        :type concurrency: Optional[int]
+        :param updated_since: only issues updated since this ISO timestamp
+        :type updated_since: Optional[str]
+        :param fields: issue fields to fetch
+        :type fields: Optional[List[str]]
+        :return: raw issues, in order
+        :rtype: List[Dict]
+        """
+        concurrency = concurrency or self.api_concurrency
+        semaphore = asyncio.Semaphore(concurrency)
+        jql = self._build_jql(project, updated_since)
+
+        async with httpx.AsyncClient(
+            base_url=self.jira.url,
+            auth=self.auth,
+            headers={"Accept": "application/json"},
+            timeout=self.jira.timeout,
+            verify=self.jira.verify_ssl,
+            limits=httpx.Limits(max_connections=concurrency),
+        ) as client:
+            issues = await self._aget_issues_with_jql(
+                client, jql, start=0, fields=fields
+            )
+            page_size = issues["maxResults"]
+            if not page_size or len(issues["issues"]) >= issues["total"]:
+                return issues["issues"]
+
+            async def _fetch_page(start: int) -> List[Dict]:
+                async with semaphore:
+                    page = await self._aget_issues_with_jql(
+                        client, jql, start=start, fields=fields
+                    )
+                return page["issues"]
+
+            pages = await asyncio.gather(
+                *(
+                    _fetch_page(start)
+                    for start in range(page_size, issues["total"], page_size)
+                )
+            )
+        return list(itertools.chain(issues["issues"], *pages))
+
+    def iter_issue_pages(
+        self,
+        project: str,
+        concurrency: Optional[int] = None,
+        updated_since: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[List[Dict]]:
+        """
+        Yield issues of a project page by page, in order. At most concurrency
+        pages are requested, or held in memory, at once.
+
+        :param project: project key
+        :type project: str
+        :param concurrency: number of pages requested at once
+        :type concurrency: Optional[int]
+        :param updated_since: only issues updated since this ISO timestamp
+        :type updated_since: Optional[str]
+        :param fields: issue fields to fetch
+        :type fields: Optional[List[str]]
+        :param limit: issues requested per page
+        :type limit: Optional[int]
+        :return: pages of raw issues
+        :rtype: Iterator[List[Dict]]
+        """
+        concurrency = concurrency or self.api_concurrency
+        jql = self._build_jql(project, updated_since)
+
+        issues = self._get_issues_with_jql(jql, start=0, fields=fields, limit=limit)
+        yield issues["issues"]
+        page_size = issues["maxResults"]
+        if not page_size or len(issues["issues"]) >= issues["total"]:
+            return
+
+        # the first page tells the total, remaining pages can be requested
+        # independently
+        starts = iter(range(page_size, issues["total"], page_size))
+
+        def _fetch_page(start: int) -> List[Dict]:
+            page = self._get_issues_with_jql(
+                jql, start=start, fields=fields, limit=limit
+            )
+            return page["issues"]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            window: Deque[Future] = deque(
+                executor.submit(_fetch_page, start)
+                for start in itertools.islice(starts, concurrency)
+            )
+            while window:
+                page = window.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    window.append(executor.submit(_fetch_page, next_start))
+                yield page
+
+    def get_issue_keys_by_project(self, project: str) -> List[str]:
+        return [
+            issue["key"]
+            for page in self.iter_issue_pages(
+                project, fields=["key"], limit=self.api_keys_limit
+            )
+            for issue in page
+        ]
+
     def format_issues(self, issues: List[Dict]) -> List[Dict]:
         formatted_issues = []
         for issue in issues:
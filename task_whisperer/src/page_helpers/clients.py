@@ -0,0 +1,214 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from task_whisperer import CONFIG, PROJECT_ROOT
+from task_whisperer.src.embedding import embedding_factory, get_embedding_cache
+from task_whisperer.src.issue_tracking import BaseITSClient, ITS_factory
+from task_whisperer.src.task_generation import (
+    BaseTaskGenerator,
+    ContextAssembler,
+    ResponseCache,
+    get_response_cache,
+    task_generator_factory,
+)
+from task_whisperer.src.vector_store import (
+    BaseVectorStore,
+    get_faiss_index_cache,
+    vector_store_factory,
+)
+
+EMBEDDINGS_ROOT_PATH = os.path.join(
+    PROJECT_ROOT, CONFIG["datastore_path"], "embeddings"
+)
+FAISS_ROOT_PATH = os.path.join(EMBEDDINGS_ROOT_PATH, "faiss")
+EMBEDDING_CACHE_PATH = os.path.join(EMBEDDINGS_ROOT_PATH, "cache", "embeddings.sqlite")
+FAISS_CONFIG = CONFIG.get("vector_store_config", {}).get("faiss", {})
+
+# llm config options each client is configured with, other options (e.g.
+# temperature) are passed per call and don't require a new client
+EMBEDDING_OPTIONS = (
+    "api_key",
+    "embedding_backend",
+    "embedding_model",
+    "embedding_cache",
+    "embedding_batching",
+)
+TASK_GENERATOR_OPTIONS = EMBEDDING_OPTIONS + (
+    "llm_model",
+    "response_cache",
+    "context_assembly",
+)
+
+
+class ClientRegistry:
+    """
+    Process-wide LRU of configured clients, keyed by their kind and a hash of
+    their config including credentials. Clients, and so their HTTP connection
+    pools, are reused across requests and Streamlit reruns.
+    """
+
+    def __init__(self, max_entries: int = 32) -> None:
+        assert max_entries > 0, "max_entries must be positive"
+        self.max_entries = max_entries
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        # reentrant, clients are created with the clients they depend on
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def get_key(namespace: str, kind: str, config: Dict[str, Any]) -> str:
+        serialized = json.dumps([namespace, kind, config], sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get_or_create(
+        self,
+        namespace: str,
+        kind: str,
+        config: Dict[str, Any],
+        create: Callable[[], Any],
+    ) -> Any:
+        """
+        Get the client of the given kind and config, create it if missing.
+
+        :param namespace: type of the client, e.g. "its" or "embedding"
+        :type namespace: str
+        :param kind: kind of the client, e.g. "jira" or "openai"
+        :type kind: str
+        :param config: config the client is created with
+        :type config: Dict[str, Any]
+        :param create: callable creating the client
+        :type create: Callable[[], Any]
+        :return: cached or created client
+        :rtype: Any
+        """
+        key = self.get_key(namespace, kind, config)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = create()
+                self._clients[key] = client
+                while len(self._clients) > self.max_entries:
+                    self._clients.popitem(last=False)
+            self._clients.move_to_end(key)
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+CLIENT_REGISTRY = ClientRegistry()
+
+
+def _select_options(config: Dict[str, Any], options: tuple) -> Dict[str, Any]:
+    return {option: config.get(option) for option in options}
+
+
+def get_its_client(its_kind: str, its_config: Dict[str, Any]) -> BaseITSClient:
+    return CLIENT_REGISTRY.get_or_create(
+        "its",
+        its_kind,
+        its_config,
+        lambda: ITS_factory.get(its_kind)(
+            url=its_config["url"],
+            username=its_config["username"],
+            password=its_config["password"],
+            its_config=its_config,
+        ),
+    )
+
+
+def get_embedding_client(llm_kind: str, llm_config: Dict[str, Any]):
+    def _create():
+        cache_options = llm_config.get("embedding_cache") or {}
+        embedding_cache = (
+            get_embedding_cache(
+                EMBEDDING_CACHE_PATH, cache_options.get("max_entries", 1_000_000)
+            )
+            if cache_options.get("enabled")
+            else None
+        )
+        # embeddings are generated by the llm unless another backend is set
+        backend_options = llm_config.get("embedding_backend") or {}
+        embedding_kind = backend_options.get("kind") or llm_kind
+        model_options = dict(backend_options.get(embedding_kind) or {})
+        return embedding_factory.get(embedding_kind)(
+            api_key=llm_config["api_key"],
+            faiss_index_root_path=FAISS_ROOT_PATH,
+            embedding_model=model_options.pop(
+                "model_path", llm_config["embedding_model"]
+            ),
+            embedding_cache=embedding_cache,
+            batch_options=llm_config.get("embedding_batching"),
+            index_options=FAISS_CONFIG,
+            model_options=model_options,
+        )
+
+    return CLIENT_REGISTRY.get_or_create(
+        "embedding",
+        llm_kind,
+        _select_options(llm_config, EMBEDDING_OPTIONS),
+        _create,
+    )
+
+
+def get_vector_store_client(
+    llm_kind: str, llm_config: Dict[str, Any], kind: str = "faiss"
+) -> BaseVectorStore:
+    return CLIENT_REGISTRY.get_or_create(
+        "vector_store",
+        f"{kind}:{llm_kind}",
+        _select_options(llm_config, EMBEDDING_OPTIONS),
+        lambda: vector_store_factory.get(kind)(
+            faiss_index_root_path=FAISS_ROOT_PATH,
+            embedding_generator=get_embedding_client(llm_kind, llm_config),
+            index_cache=get_faiss_index_cache(
+                FAISS_CONFIG.get("index_cache_max_mb", 1024) * 1024**2
+            ),
+            mmap=FAISS_CONFIG.get("mmap", False),
+            index_options=FAISS_CONFIG.get("index"),
+            retrieval_options=FAISS_CONFIG.get("retrieval"),
+        ),
+    )
+
+
+def get_task_generator_client(
+    llm_kind: str, llm_config: Dict[str, Any]
+) -> BaseTaskGenerator:
+    def _create():
+        response_cache_options = llm_config.get("response_cache") or {}
+        response_cache: Optional[ResponseCache] = None
+        if response_cache_options.get("enabled"):
+            response_cache = get_response_cache(
+                response_cache_options.get("ttl_seconds", 86400),
+                response_cache_options.get("max_entries", 10000),
+                (
+                    response_cache_options.get("semantic_threshold")
+                    if response_cache_options.get("semantic_enabled")
+                    else None
+                ),
+            )
+        context_options = dict(llm_config.get("context_assembly") or {})
+        context_assembler = (
+            ContextAssembler(**context_options)
+            if context_options.pop("enabled", False)
+            else None
+        )
+        return task_generator_factory.get(llm_kind)(
+            api_key=llm_config["api_key"],
+            vector_store=get_vector_store_client(llm_kind, llm_config),
+            model=llm_config["llm_model"],
+            response_cache=response_cache,
+            max_cache_temperature=response_cache_options.get("max_temperature", 0.0),
+            context_assembler=context_assembler,
+        )
+
+    return CLIENT_REGISTRY.get_or_create(
+        "task_generator",
+        llm_kind,
+        _select_options(llm_config, TASK_GENERATOR_OPTIONS),
+        _create,
+    )
@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from task_whisperer import CONFIG
+
+
+def get_default_config(config_name: str, kind: str) -> Dict[str, Any]:
+    """
+    Non-interactive counterpart of the sidebar. Returns the options of a
+    config section with their default values, the first value is taken for
+    selections.
+
+    :param config_name: config section, e.g. "its_config" or "llm_config"
+    :type config_name: str
+    :param kind: kind in the config section, e.g. "jira" or "openai"
+    :type kind: str
+    :return: option values by option key
+    :rtype: Dict[str, Any]
+    """
+    options_dict: Dict[str, Any] = CONFIG[config_name][kind]
+    option_config = {}
+
+    for key, options in options_dict.items():
+        if options.get("hidden"):
+            option_config[key] = options["options"]
+        else:
+            value = options.get("value")
+            option_config[key] = (
+                value[0] if isinstance(value, list) and value else value
+            )
+
+    return option_config
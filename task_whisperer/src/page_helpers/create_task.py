@@ -1,6 +1,6 @@
 from typing import Any, Dict
 
-from task_whisperer.src.issue_tracking.factory import ITS_factory
+from task_whisperer.src.page_helpers.clients import get_its_client
 
 
 def create_task(
@@ -11,12 +11,7 @@ def create_task(
     project: str,
     extra_fields: Dict[str, Any] = {},
 ):
-    its_client = ITS_factory.get(its_kind)(
-        url=its_config["url"],
-        username=its_config["username"],
-        password=its_config["password"],
-        its_config=its_config,
-    )
+    its_client = get_its_client(its_kind, its_config)
     response = its_client.create_issue(
         project, task_summary, task_description, extra_fields
     )
@@ -0,0 +1,66 @@
+from typing import Any, Dict
+
+import pandas as pd
+
+from task_whisperer import CONFIG
+from task_whisperer.src.page_helpers.clients import get_vector_store_client
+from task_whisperer.src.page_helpers.issues import IssueService
+from task_whisperer.src.vector_store import find_duplicate_clusters
+
+DUPLICATES_CONFIG = CONFIG.get("duplicates_config", {})
+DUPLICATE_COLUMNS = ["cluster", "key", "summary", "cluster_size", "max_similarity"]
+
+
+class DuplicateService:
+    def __init__(self, llm_kind: str, its_kind: str, llm_config: Dict[str, Any]):
+        self.llm_kind = llm_kind
+        self.its_kind = its_kind
+        self.llm_config = llm_config
+
+    def find_duplicates(
+        self,
+        project: str,
+        threshold: float = DUPLICATES_CONFIG.get("threshold", 0.95),
+    ) -> pd.DataFrame:
+        """
+        Find clusters of near-duplicate issues of a project in its index.
+
+        :param project: project key
+        :type project: str
+        :param threshold: minimum cosine similarity of duplicates
+        :type threshold: float
+        :return: one row per issue of a cluster, largest clusters first
+        :rtype: pd.DataFrame
+        """
+        vector_store = get_vector_store_client(self.llm_kind, self.llm_config)
+        assert vector_store.has_index(project), f"No embeddings of {project}"
+        clusters = find_duplicate_clusters(
+            vector_store.read_vector_index(project),
+            threshold=threshold,
+            block_size=DUPLICATES_CONFIG.get("block_size", 2048),
+        )
+
+        duplicates_df = pd.DataFrame(
+            [
+                {
+                    "cluster": cluster_no,
+                    "key": key,
+                    "cluster_size": len(cluster.keys),
+                    "max_similarity": round(cluster.max_similarity, 4),
+                }
+                for cluster_no, cluster in enumerate(clusters, start=1)
+                for key in cluster.keys
+            ],
+            columns=["cluster", "key", "cluster_size", "max_similarity"],
+        )
+        if duplicates_df.empty:
+            return pd.DataFrame(columns=DUPLICATE_COLUMNS)
+
+        issue_service = IssueService(its_config={}, its_kind=self.its_kind)
+        summaries_df = issue_service.load_issues(
+            project, processed=True, columns=["key", "summary"]
+        )
+        if "key" not in summaries_df.columns:
+            summaries_df = pd.DataFrame(columns=["key", "summary"])
+        duplicates_df = duplicates_df.merge(summaries_df, on="key", how="left")
+        return duplicates_df[DUPLICATE_COLUMNS]
@@ -1,19 +1,24 @@
 from datetime import datetime
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Callable, Dict, List, Optional
 
-import pandas as pd
 import yaml
 
 from task_whisperer import CONFIG, PROJECT_ROOT
+from task_whisperer.src.page_helpers.clients import (
+    FAISS_ROOT_PATH,
+    get_embedding_client,
+)
 from task_whisperer.src.page_helpers.issues import IssueService
-from task_whisperer.src.embedding import embedding_factory
 
 ISSUES_DATASTORE_PATH = os.path.join(PROJECT_ROOT, CONFIG["datastore_path"], "issues")
-EMBEDDINGS_ROOT_PATH = os.path.join(
-    PROJECT_ROOT, CONFIG["datastore_path"], "embeddings"
-)
-FAISS_ROOT_PATH = os.path.join(EMBEDDINGS_ROOT_PATH, "faiss")
+# columns of the processed issues which are embedded
+EMBEDDING_COLUMNS = ["key", "summary", "description_cleaned"]
+# processed issues are read, embedded and indexed in batches of this size
+ISSUE_BATCH_SIZE = 1000
+# guards read-modify-write of _meta.yml by concurrent project pipelines
+METADATA_LOCK = threading.Lock()
 
 
 class GenerateEmbeddingsService:
@@ -24,26 +29,36 @@ class GenerateEmbeddingsService:
 
     def get_issues_meta(self) -> Dict[str, Dict[str, Any]]:
         issue_service = IssueService(its_config={}, its_kind=self.its_kind)
-        issues_meta = issue_service.load_metadata()
+        issues_meta = issue_service.load_metadata() or []
         issues_meta = {row["project"]: row for row in issues_meta}
         return issues_meta
 
-    def create_embeddings(self, project: str) -> str:
+    def create_embeddings(
+        self,
+        project: str,
+        incremental: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> str:
         os.makedirs(FAISS_ROOT_PATH, exist_ok=True)
-        issues_meta = self.get_issues_meta()
-        project_meta = issues_meta[project]
-        processed_issues_df = pd.read_csv(
-            os.path.join(PROJECT_ROOT, project_meta["processed_issues_path"])
-        )
-
-        embedding_client = embedding_factory.get(self.llm_kind)(
-            api_key=self.llm_config["api_key"],
-            faiss_index_root_path=FAISS_ROOT_PATH,
-            embedding_model=self.llm_config["embedding_model"],
+        issue_service = IssueService(its_config={}, its_kind=self.its_kind)
+        project_meta = self.get_issues_meta().get(project, {})
+        assert project_meta.get(
+            "issue_count_after_preprocess"
+        ), f"No processed issues of {project}"
+        processed_issue_batches = issue_service.issue_store.iter_load(
+            project,
+            processed=True,
+            columns=EMBEDDING_COLUMNS,
+            batch_size=ISSUE_BATCH_SIZE,
         )
 
+        embedding_client = get_embedding_client(self.llm_kind, self.llm_config)
         embedding_path = embedding_client.generate_embeddings(
-            project, processed_issues_df
+            project,
+            processed_issue_batches,
+            incremental=incremental,
+            progress_callback=progress_callback,
+            n_issues=project_meta["issue_count_after_preprocess"],
         )
         return embedding_path
 
@@ -73,19 +88,20 @@ class GenerateEmbeddingsService:
 
     def save_embeddings_paths(self, project_embedding_paths: Dict[str, Any]) -> None:
         meta_path = os.path.join(FAISS_ROOT_PATH, self.llm_kind, "_meta.yml")
-        meta = self._read_metadata(meta_path)
+        with METADATA_LOCK:
+            meta = self._read_metadata(meta_path)
 
-        for project, embedding_path in project_embedding_paths.items():
-            now_ts = datetime.now().timestamp()
+            for project, embedding_path in project_embedding_paths.items():
+                now_ts = datetime.now().timestamp()
 
-            new_info = {"_updated_at": now_ts, "embedding_path": embedding_path}
+                new_info = {"_updated_at": now_ts, "embedding_path": embedding_path}
 
-            if project in meta:
-                meta[project] = {**meta[project], **new_info}
-            else:
-                meta[project] = {"_created_at": now_ts, **new_info}
+                if project in meta:
+                    meta[project] = {**meta[project], **new_info}
+                else:
+                    meta[project] = {"_created_at": now_ts, **new_info}
 
-        self._write_metadata(meta, meta_path)
+            self._write_metadata(meta, meta_path)
 
     @staticmethod
     def _read_metadata(meta_path: str) -> Dict[str, Any]:
@@ -99,5 +115,10 @@ class GenerateEmbeddingsService:
 
     @staticmethod
     def _write_metadata(meta: Dict, meta_path: str):
-        with open(meta_path, "w") as f:
+        # indices of other embedding backends are saved under other directories
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        # moved into place, so that readers never see a partially written file
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as f:
             yaml.dump(meta, f)
+        os.replace(tmp_path, meta_path)
@@ -1,85 +1,302 @@
 from datetime import datetime
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
 import yaml
 
 from task_whisperer import CONFIG, PROJECT_ROOT
-from task_whisperer.src.issue_tracking import (
-    BaseITSClient,
-    ITS_factory,
-    MANDATORY_FIELDS,
+from task_whisperer.src.datastore import (
+    BaseIssueStore,
+    issue_store_factory,
+    migrate_issue_store,
 )
+from task_whisperer.src.issue_tracking import BaseITSClient, MANDATORY_FIELDS
 from task_whisperer.src.embedding.preprocessing import preprocess_issues
+from task_whisperer.src.page_helpers.clients import get_its_client
 
 DATASTORE_PATH = os.path.join(PROJECT_ROOT, CONFIG["datastore_path"], "issues")
 os.makedirs(DATASTORE_PATH, exist_ok=True)
+ISSUE_STORE_CONFIG = CONFIG.get("issue_store_config", {})
+# guards read-modify-write of _meta.yml by concurrent project pipelines
+METADATA_LOCK = threading.Lock()
+
+
+def get_issue_store(its_kind: str, kind: Optional[str] = None) -> BaseIssueStore:
+    kind = kind or ISSUE_STORE_CONFIG.get("kind", "csv")
+    return issue_store_factory.get(kind)(
+        root_path=DATASTORE_PATH,
+        its_kind=its_kind,
+        **ISSUE_STORE_CONFIG.get(kind, {}),
+    )
 
 
 class IssueService:
     def __init__(self, its_config: Dict[str, Any], its_kind: str):
         self.its_config = its_config
         self.its_kind = its_kind
-
-    def fetch_issues(self, projects: List[str]) -> Dict[str, List[Dict]]:
+        self.issue_store = get_issue_store(its_kind)
+
+    def fetch_issues(
+        self, projects: List[str], incremental: bool = False, sweep_deleted: bool = True
+    ) -> Dict[str, List[Dict]]:
+        """
+        Fetch issues of the given projects from the ITS.
+
+        :param projects: project keys to fetch
+        :type projects: List[str]
+        :param incremental: only fetch issues updated since the watermark of
+            the previous fetch and merge them into the stored issues. Projects
+            without a watermark are fetched fully.
+        :type incremental: bool
+        :param sweep_deleted: on incremental fetches, list every key of the
+            project to drop the stored issues deleted on the ITS
+        :type sweep_deleted: bool
+        :return: formatted issues by project
+        :rtype: Dict[str, List[Dict]]
+        """
         assert projects, "projects list must be non-empty!"
 
-        its_client: BaseITSClient = ITS_factory.get(self.its_kind)(
-            url=self.its_config["url"],
-            username=self.its_config["username"],
-            password=self.its_config["password"],
-            its_config=self.its_config,
-        )
+        its_client = self._get_its_client()
+        meta_path = os.path.join(DATASTORE_PATH, self.its_kind, "_meta.yml")
+        meta = self._read_metadata(meta_path) if incremental else {}
 
         issue_list_dict = {}
         for project in projects:
-            issues = its_client.get_issues_by_project(project)
-            formatted_issues = its_client.format_issues(issues)
+            watermark = meta.get(project, {}).get("updated_watermark")
+            if watermark:
+                issues = its_client.get_issues_by_project(
+                    project, updated_since=watermark
+                )
+                formatted_issues = self._merge_issues(
+                    project,
+                    its_client.format_issues(issues),
+                    (
+                        its_client.get_issue_keys_by_project(project)
+                        if sweep_deleted
+                        else None
+                    ),
+                )
+            else:
+                issues = its_client.get_issues_by_project(project)
+                formatted_issues = its_client.format_issues(issues)
             issue_list_dict[project] = formatted_issues
 
         return issue_list_dict
 
+    def _get_its_client(self) -> BaseITSClient:
+        return get_its_client(self.its_kind, self.its_config)
+
+    def fetch_and_save_issues(
+        self,
+        project: str,
+        incremental: bool = False,
+        sweep_deleted: Optional[bool] = None,
+    ) -> int:
+        """
+        Fetch issues of a project page by page and append each page, raw and
+        preprocessed, to the issue store. Only a page of issues is held in
+        memory at once, and the stored issues are replaced once all pages are
+        written.
+
+        :param project: project key
+        :type project: str
+        :param incremental: only fetch issues updated since the watermark of
+            the previous fetch and merge them into the stored issues. Projects
+            without a watermark are fetched fully.
+        :type incremental: bool
+        :param sweep_deleted: on incremental fetches, list every key of the
+            project to drop the stored issues deleted on the ITS. By default
+            they are swept every deletion_sweep_interval incremental fetches.
+        :type sweep_deleted: Optional[bool]
+        :return: number of stored issues
+        :rtype: int
+        """
+        its_client = self._get_its_client()
+        meta_path = os.path.join(DATASTORE_PATH, self.its_kind, "_meta.yml")
+        meta = self._read_metadata(meta_path) if incremental else {}
+        watermark = meta.get(project, {}).get("updated_watermark")
+
+        # a full fetch drops deleted issues as well
+        sync_info = {"syncs_since_deletion_sweep": 0}
+        if watermark:
+            updated_issues = its_client.get_issues_by_project(
+                project, updated_since=watermark
+            )
+            sweep_deleted, sync_info = self._get_deletion_sweep(
+                meta[project], sweep_deleted
+            )
+            pages = self._iter_merged_pages(
+                project,
+                pd.DataFrame(its_client.format_issues(updated_issues)),
+                (
+                    set(its_client.get_issue_keys_by_project(project))
+                    if sweep_deleted
+                    else None
+                ),
+            )
+        else:
+            pages = (
+                pd.DataFrame(its_client.format_issues(page))
+                for page in its_client.iter_issue_pages(project)
+            )
+
+        n_processed, watermarks = 0, []
+        raw_writer = self.issue_store.open_writer(project)
+        processed_writer = self.issue_store.open_writer(project, processed=True)
+        with raw_writer, processed_writer:
+            for df in pages:
+                if df.empty:
+                    continue
+                raw_writer.write(df)
+                df_processed = preprocess_issues(df)
+                processed_writer.write(df_processed)
+                n_processed += len(df_processed)
+                watermarks.append(self._get_updated_watermark(df))
+
+        new_info = {
+            "_updated_at": datetime.now().timestamp(),
+            "issue_count": raw_writer.n_rows,
+            "issue_count_after_preprocess": n_processed,
+            "processed_issues_path": processed_writer.path,
+            **sync_info,
+        }
+        watermarks = [watermark for watermark in watermarks if watermark]
+        if watermarks:
+            new_info["updated_watermark"] = max(watermarks)
+
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        self._update_metadata(meta_path, project, new_info)
+        return raw_writer.n_rows
+
+    def _get_deletion_sweep(
+        self, project_meta: Dict[str, Any], sweep_deleted: Optional[bool]
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Whether an incremental fetch sweeps deleted issues, and the sync info
+        to store in the meta of the project. Listing every key of a project
+        costs as many requests as a full fetch, so by default deleted issues
+        are swept every deletion_sweep_interval incremental fetches.
+        """
+        n_syncs = project_meta.get("syncs_since_deletion_sweep", 0) + 1
+        if sweep_deleted is None:
+            interval = self.its_config.get("sync_options", {}).get(
+                "deletion_sweep_interval", 1
+            )
+            sweep_deleted = interval > 0 and n_syncs >= interval
+        return sweep_deleted, {
+            "syncs_since_deletion_sweep": 0 if sweep_deleted else n_syncs
+        }
+
+    def _iter_merged_pages(
+        self,
+        project: str,
+        updated_df: pd.DataFrame,
+        issue_keys: Optional[Set[str]],
+    ) -> Iterator[pd.DataFrame]:
+        """Streaming counterpart of _merge_issues"""
+        updated_keys = set(updated_df["key"]) if "key" in updated_df else set()
+        for stored_df in self.issue_store.iter_load(project):
+            if "key" in stored_df.columns:
+                keep = ~stored_df["key"].isin(updated_keys)
+                if issue_keys is not None:
+                    keep &= stored_df["key"].isin(issue_keys)
+                stored_df = stored_df[keep]
+            yield stored_df
+
+        if "key" in updated_df.columns and issue_keys is not None:
+            updated_df = updated_df[updated_df["key"].isin(issue_keys)]
+        yield updated_df
+
+    def _merge_issues(
+        self,
+        project: str,
+        updated_issues: List[Dict],
+        issue_keys: Optional[List[str]],
+    ) -> List[Dict]:
+        """
+        Upsert updated issues into the stored issues of the project by key,
+        and drop the stored issues which no longer exist on the ITS.
+
+        :param project: project key
+        :type project: str
+        :param updated_issues: formatted issues updated since the watermark
+        :type updated_issues: List[Dict]
+        :param issue_keys: keys of all issues currently on the ITS, None to
+            keep the stored issues
+        :type issue_keys: Optional[List[str]]
+        :return: merged issues
+        :rtype: List[Dict]
+        """
+        stored_df = self.load_issues(project)
+        updated_df = pd.DataFrame(updated_issues)
+        if "key" in stored_df.columns and "key" in updated_df.columns:
+            stored_df = stored_df[~stored_df["key"].isin(updated_df["key"])]
+
+        merged_df = pd.concat([stored_df, updated_df], ignore_index=True)
+        if "key" in merged_df.columns and issue_keys is not None:
+            merged_df = merged_df[merged_df["key"].isin(set(issue_keys))]
+        return merged_df.to_dict("records")
+
+    @staticmethod
+    def _get_updated_watermark(df: pd.DataFrame) -> Optional[str]:
+        if "updated" not in df.columns:
+            return None
+
+        updated = pd.to_datetime(
+            df["updated"], utc=True, errors="coerce", format="ISO8601"
+        ).max()
+        return None if pd.isna(updated) else updated.isoformat()
+
     def save_issues(self, issue_list_by_project: Dict[str, List[Dict]]):
         its_kind_root_path = os.path.join(DATASTORE_PATH, self.its_kind)
         os.makedirs(its_kind_root_path, exist_ok=True)
         meta_path = os.path.join(its_kind_root_path, "_meta.yml")
 
-        meta = self._read_metadata(meta_path)
-
         for project, issues in issue_list_by_project.items():
-            issues_path = os.path.join(its_kind_root_path, f"{project}_issues.csv")
-            df = pd.DataFrame(issues)
-            df.to_csv(issues_path, index=False)
+            new_info = self._store_issues(project, pd.DataFrame(issues))
+            self._update_metadata(meta_path, project, new_info)
 
-            issues_processed_path = os.path.join(
-                its_kind_root_path, f"{project}_issues_processed.csv"
-            )
-            df_processed = preprocess_issues(df)
-            df_processed.to_csv(issues_processed_path, index=False)
-
-            now_ts = datetime.now().timestamp()
-            new_info = {
-                "_updated_at": now_ts,
-                "issue_count": len(df),
-                "issue_count_after_preprocess": len(df_processed),
-                "processed_issues_path": issues_processed_path,
-            }
+    def _store_issues(self, project: str, df: pd.DataFrame) -> Dict[str, Any]:
+        """Store raw and processed issues of project, return its new meta"""
+        self.issue_store.save(project, df)
+        df_processed = preprocess_issues(df)
+        issues_processed_path = self.issue_store.save(
+            project, df_processed, processed=True
+        )
 
+        now_ts = datetime.now().timestamp()
+        new_info = {
+            "_updated_at": now_ts,
+            "issue_count": len(df),
+            "issue_count_after_preprocess": len(df_processed),
+            "processed_issues_path": issues_processed_path,
+        }
+        watermark = self._get_updated_watermark(df)
+        if watermark:
+            new_info["updated_watermark"] = watermark
+        return new_info
+
+    def _update_metadata(
+        self, meta_path: str, project: str, new_info: Dict[str, Any]
+    ) -> None:
+        with METADATA_LOCK:
+            meta = self._read_metadata(meta_path)
             if project in meta:
                 meta[project] = {**meta[project], **new_info}
             else:
-                meta[project] = {"_created_at": now_ts, **new_info}
-
-        self._write_metadata(meta, meta_path)
-
-    def load_issues(self, project: str) -> pd.DataFrame:
+                meta[project] = {"_created_at": new_info["_updated_at"], **new_info}
+            self._write_metadata(meta, meta_path)
+
+    def load_issues(
+        self,
+        project: str,
+        processed: bool = False,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
         try:
-            issues_path = os.path.join(
-                DATASTORE_PATH, self.its_kind, f"{project}_issues.csv"
-            )
-            df = pd.read_csv(issues_path)
-            return df
+            return self.issue_store.load(project, processed=processed, columns=columns)
         except:
             return pd.DataFrame(columns=[])
 
@@ -128,33 +345,36 @@ class IssueService:
         os.makedirs(its_kind_root_path, exist_ok=True)
         meta_path = os.path.join(its_kind_root_path, "_meta.yml")
 
-        issues_path = os.path.join(
-            DATASTORE_PATH, self.its_kind, f"{project}_issues.csv"
-        )
-        df.to_csv(issues_path, index=False)
-
-        issues_processed_path = os.path.join(
-            its_kind_root_path, f"{project}_issues_processed.csv"
-        )
-        df_processed = preprocess_issues(df)
-        df_processed.to_csv(issues_processed_path, index=False)
-
-        meta = self._read_metadata(meta_path)
-
-        now_ts = datetime.now().timestamp()
-        new_info = {
-            "_updated_at": now_ts,
-            "issue_count": len(df),
-            "issue_count_after_preprocess": len(df_processed),
-            "processed_issues_path": issues_processed_path,
-        }
-
-        if project in meta:
-            meta[project] = {**meta[project], **new_info}
-        else:
-            meta[project] = {"_created_at": now_ts, **new_info}
-
-        self._write_metadata(meta, meta_path)
+        new_info = self._store_issues(project, df)
+        self._update_metadata(meta_path, project, new_info)
+
+    def migrate_issues(self, source_kind: str) -> List[str]:
+        """
+        Migrate the stored issues of all projects from the source_kind store
+        (e.g. csv) to the configured store, and point the meta to the new
+        processed issues.
+
+        :param source_kind: kind of the store to migrate from
+        :type source_kind: str
+        :return: migrated projects
+        :rtype: List[str]
+        """
+        source_store = get_issue_store(self.its_kind, kind=source_kind)
+        assert (
+            source_store.kind != self.issue_store.kind
+        ), f"Issues are already stored as {source_kind}"
+
+        meta_path = os.path.join(DATASTORE_PATH, self.its_kind, "_meta.yml")
+        migrated = migrate_issue_store(source_store, self.issue_store)
+        with METADATA_LOCK:
+            meta = self._read_metadata(meta_path)
+            for project, paths in migrated.items():
+                if project in meta:
+                    meta[project]["processed_issues_path"] = paths["processed"]
+
+            if meta:
+                self._write_metadata(meta, meta_path)
+        return list(migrated.keys())
 
     @staticmethod
     def _read_metadata(meta_path: str) -> Dict[str, Any]:
@@ -168,5 +388,8 @@ class IssueService:
 
     @staticmethod
     def _write_metadata(meta: Dict, meta_path: str) -> None:
-        with open(meta_path, "w") as f:
+        # moved into place, so that readers never see a partially written file
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as f:
             yaml.dump(meta, f)
+        os.replace(tmp_path, meta_path)
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+import queue
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from task_whisperer import CONFIG
+
+from task_whisperer.src.page_helpers.generate_embeddings import (
+    GenerateEmbeddingsService,
+)
+from task_whisperer.src.page_helpers.issues import IssueService
+
+# fetch also preprocesses and stores the fetched issues
+STAGES = ("fetch", "embed")
+PIPELINE_MAX_WORKERS = CONFIG.get("pipeline_config", {}).get("max_workers", 4)
+
+
+@dataclass
+class ProjectStatus:
+    """Class for keeping the pipeline status of a project"""
+
+    project: str
+    stage: Optional[str] = None
+    state: str = "pending"
+    progress: float = 0.0
+    issue_count: Optional[int] = None
+    embedding_path: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ProjectPipeline:
+    """
+    Runs fetch, preprocess and embed stages of many projects in a worker
+    pool. Stages of a project run in order, while projects run concurrently,
+    so fetching of a project overlaps with embedding of another. A failing
+    project doesn't stop the others.
+    """
+
+    def __init__(
+        self,
+        issue_service: Optional[IssueService] = None,
+        embeddings_service: Optional[GenerateEmbeddingsService] = None,
+        max_workers: int = PIPELINE_MAX_WORKERS,
+    ) -> None:
+        assert max_workers > 0, "max_workers must be positive"
+        self.issue_service = issue_service
+        self.embeddings_service = embeddings_service
+        self.max_workers = max_workers
+
+    def run(
+        self,
+        projects: List[str],
+        stages: Tuple[str, ...] = STAGES,
+        incremental: bool = False,
+    ) -> Iterator[ProjectStatus]:
+        """
+        Run stages of projects. Status updates are yielded from the calling
+        thread, so they can be rendered by Streamlit.
+
+        :param projects: project keys
+        :type projects: List[str]
+        :param stages: stages to run, fetch needs an issue_service and
+            embed needs an embeddings_service
+        :type stages: Tuple[str, ...]
+        :param incremental: fetch and embed incrementally
+        :type incremental: bool
+        :return: status of a project on every change, the last status of each
+            project has state "done" or "failed"
+        :rtype: Iterator[ProjectStatus]
+        """
+        assert projects, "projects list must be non-empty!"
+        assert set(stages).issubset(STAGES), f"stages must be a subset of {STAGES}"
+        assert (
+            self.issue_service or "fetch" not in stages
+        ), "issue_service is required to fetch issues"
+        assert (
+            self.embeddings_service or "embed" not in stages
+        ), "embeddings_service is required to embed issues"
+
+        updates: "queue.Queue[ProjectStatus]" = queue.Queue()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for project in projects:
+                executor.submit(
+                    self._run_project,
+                    ProjectStatus(project),
+                    stages,
+                    incremental,
+                    updates.put,
+                )
+
+            n_finished = 0
+            while n_finished < len(projects):
+                status = updates.get()
+                if status.state in ("done", "failed"):
+                    n_finished += 1
+                yield status
+
+    def _run_project(
+        self,
+        status: ProjectStatus,
+        stages: Tuple[str, ...],
+        incremental: bool,
+        on_update: Callable[[ProjectStatus], None],
+    ) -> None:
+        def _update(**changes):
+            nonlocal status
+            status = replace(status, **changes)
+            on_update(status)
+
+        try:
+            if "fetch" in stages:
+                _update(stage="fetch", state="running")
+                issue_count = self.issue_service.fetch_and_save_issues(
+                    status.project, incremental=incremental
+                )
+                _update(issue_count=issue_count, progress=1.0)
+
+            if "embed" in stages:
+                _update(stage="embed", state="running", progress=0.0)
+
+                def _on_progress(n_embedded: int, n_total: int):
+                    _update(progress=n_embedded / n_total)
+
+                embedding_path = self.embeddings_service.create_embeddings(
+                    status.project,
+                    incremental=incremental,
+                    progress_callback=_on_progress,
+                )
+                self.embeddings_service.save_embeddings_paths(
+                    {status.project: embedding_path}
+                )
+                _update(embedding_path=embedding_path, progress=1.0)
+
+            _update(state="done")
+        except Exception as e:
+            _update(state="failed", error=str(e))
+
+    def run_all(
+        self,
+        projects: List[str],
+        stages: Tuple[str, ...] = STAGES,
+        incremental: bool = False,
+    ) -> Dict[str, ProjectStatus]:
+        """Run stages of projects and return the final status of each"""
+        final_statuses = {}
+        for status in self.run(projects, stages, incremental):
+            final_statuses[status.project] = status
+        return final_statuses
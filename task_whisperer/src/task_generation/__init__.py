@@ -1,7 +1,16 @@
 from .base import BaseTaskGenerator
+from .cache import ResponseCache, get_response_cache
+from .context import AssembledContext, ContextAssembler
 from .factory import task_generator_factory
 from .openai import OpenAITaskGenerator
 
 task_generator_factory.register("openai", OpenAITaskGenerator)
 
-__all__ = ["BaseTaskGenerator", "task_generator_factory"]
+__all__ = [
+    "AssembledContext",
+    "BaseTaskGenerator",
+    "ContextAssembler",
+    "ResponseCache",
+    "get_response_cache",
+    "task_generator_factory",
+]
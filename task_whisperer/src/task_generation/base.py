@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
+from task_whisperer.src.task_generation.cache import ResponseCache
+from task_whisperer.src.task_generation.context import ContextAssembler
 from task_whisperer.src.vector_store.base import BaseVectorStore
 
 
@@ -12,16 +15,52 @@ class BaseTaskGenerator(ABC):
         api_key: str,
         vector_store: BaseVectorStore,
         model: str,
+        response_cache: Optional[ResponseCache] = None,
+        max_cache_temperature: float = 0.0,
+        context_assembler: Optional[ContextAssembler] = None,
     ) -> None:
         pass
 
     @abstractmethod
     def create_task_description(
         self,
-        project: str,
+        project: Union[str, List[str]],
         task_summary: str,
         task_desc: str = "",
         n_similar_tasks: int = 5,
         temperature: float = 0,
     ):
         pass
+
+    @abstractmethod
+    async def acreate_task_description(
+        self,
+        project: str,
+        task_summary: str,
+        task_desc: str = "",
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+    ) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def stream_task_description(
+        self,
+        project: Union[str, List[str]],
+        task_summary: str,
+        task_desc: str = "",
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+    ) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def create_task_descriptions(
+        self,
+        project: str,
+        task_summaries: List[str],
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+        max_workers: int = 8,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        pass
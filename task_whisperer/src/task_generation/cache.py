@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from functools import lru_cache
+import hashlib
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class _ScopeVectors:
+    """
+    Normalized query vectors of a scope in the rows of a matrix, which is
+    grown by doubling, so that lookups don't stack the vectors of a scope.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 64) -> None:
+        self.vectors = np.empty((capacity, dimension), dtype=np.float32)
+        self.entry_ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+
+    def add(self, entry_id: int, vector: np.ndarray) -> None:
+        row = len(self.entry_ids)
+        if row == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+        self.vectors[row] = vector
+        self.entry_ids.append(entry_id)
+        self.rows[entry_id] = row
+
+    def remove(self, entry_id: int) -> None:
+        # the last row is moved into the removed one
+        row = self.rows.pop(entry_id)
+        last_entry_id = self.entry_ids.pop()
+        if last_entry_id != entry_id:
+            self.vectors[row] = self.vectors[len(self.entry_ids)]
+            self.entry_ids[row] = last_entry_id
+            self.rows[last_entry_id] = row
+
+    def search(self, query_vector: np.ndarray) -> Tuple[int, float]:
+        """Entry id of the most similar vector and its cosine similarity"""
+        similarities = self.vectors[: len(self.entry_ids)] @ query_vector
+        best = int(np.argmax(similarities))
+        return self.entry_ids[best], float(similarities[best])
+
+
+class ResponseCache:
+    """
+    Two tier LLM response cache. The exact tier is keyed by the hash of the
+    model, temperature, system prompt and user prompt. The optional semantic
+    tier reuses an answer of the same scope (e.g. model and project) when the
+    query embedding is within semantic_threshold cosine similarity of a cached
+    one. Both tiers expire entries after ttl_seconds and evict least recently
+    used entries beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000,
+        semantic_threshold: Optional[float] = None,
+    ) -> None:
+        assert ttl_seconds > 0, "ttl_seconds must be positive"
+        assert max_entries > 0, "max_entries must be positive"
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        # answers in least recently used order, and their expiry times in the
+        # order they were set, which is the order they expire in as every
+        # entry lives for ttl_seconds
+        self._exact: "OrderedDict[str, str]" = OrderedDict()
+        self._exact_expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._semantic: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._semantic_expiry: "OrderedDict[int, float]" = OrderedDict()
+        self._scope_vectors: Dict[str, _ScopeVectors] = {}
+        self._semantic_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+        model: str, temperature: float, system_prompt: str, user_prompt: str
+    ) -> str:
+        key_parts = [model, repr(float(temperature)), system_prompt, user_prompt]
+        return hashlib.sha256("\x1f".join(key_parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _is_semantic(
+        self, scope: Optional[str], query_embedding: Optional[List[float]]
+    ) -> bool:
+        return bool(self.semantic_threshold and scope and query_embedding is not None)
+
+    def get(
+        self,
+        key: str,
+        scope: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> Optional[str]:
+        """
+        Look up a cached answer, first by the exact key and then, if semantic
+        caching is enabled, by the query embedding within the scope.
+
+        :param key: exact key, see get_key
+        :type key: str
+        :param scope: scope of the semantic lookup
+        :type scope: Optional[str]
+        :param query_embedding: embedding of the query
+        :type query_embedding: Optional[List[float]]
+        :return: cached answer if any
+        :rtype: Optional[str]
+        """
+        is_semantic = self._is_semantic(scope, query_embedding)
+        query_vector = self._normalize(query_embedding) if is_semantic else None
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+
+            answer = self._exact.get(key)
+            if answer is not None:
+                self._exact.move_to_end(key)
+                self.exact_hits += 1
+                return answer
+
+            if is_semantic:
+                answer = self._get_semantic(scope, query_vector)
+                if answer is not None:
+                    self.semantic_hits += 1
+                    return answer
+
+            self.misses += 1
+            return None
+
+    def _get_semantic(self, scope: str, query_vector: np.ndarray) -> Optional[str]:
+        scope_vectors = self._scope_vectors.get(scope)
+        if scope_vectors is None:
+            return None
+
+        entry_id, similarity = scope_vectors.search(query_vector)
+        if similarity < self.semantic_threshold:
+            return None
+
+        self._semantic.move_to_end(entry_id)
+        return self._semantic[entry_id][1]
+
+    def set(
+        self,
+        key: str,
+        answer: str,
+        scope: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> None:
+        is_semantic = self._is_semantic(scope, query_embedding)
+        query_vector = self._normalize(query_embedding) if is_semantic else None
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._exact[key] = answer
+            self._exact.move_to_end(key)
+            self._exact_expiry[key] = expires_at
+            self._exact_expiry.move_to_end(key)
+            while len(self._exact) > self.max_entries:
+                evicted_key, _ = self._exact.popitem(last=False)
+                del self._exact_expiry[evicted_key]
+
+            if is_semantic:
+                entry_id = next(self._semantic_ids)
+                self._semantic[entry_id] = (scope, answer)
+                self._semantic_expiry[entry_id] = expires_at
+                if scope not in self._scope_vectors:
+                    self._scope_vectors[scope] = _ScopeVectors(len(query_vector))
+                self._scope_vectors[scope].add(entry_id, query_vector)
+                while len(self._semantic) > self.max_entries:
+                    self._delete_semantic(next(iter(self._semantic)))
+
+    def _delete_semantic(self, entry_id: int) -> None:
+        scope, _ = self._semantic.pop(entry_id)
+        del self._semantic_expiry[entry_id]
+        scope_vectors = self._scope_vectors[scope]
+        scope_vectors.remove(entry_id)
+        if not scope_vectors:
+            del self._scope_vectors[scope]
+
+    def _expire(self, now: float) -> None:
+        """Drop expired entries, only the oldest ones are visited"""
+        while self._exact_expiry:
+            key, expires_at = next(iter(self._exact_expiry.items()))
+            if expires_at > now:
+                break
+            del self._exact_expiry[key]
+            del self._exact[key]
+        while self._semantic_expiry:
+            entry_id, expires_at = next(iter(self._semantic_expiry.items()))
+            if expires_at > now:
+                break
+            self._delete_semantic(entry_id)
+
+    def stats(self) -> Dict[str, float]:
+        n_requests = self.exact_hits + self.semantic_hits + self.misses
+        n_hits = self.exact_hits + self.semantic_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": n_hits / n_requests if n_requests else 0.0,
+            "entries": len(self._exact),
+            "semantic_entries": len(self._semantic),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_response_cache(
+    ttl_seconds: float = 86400,
+    max_entries: int = 10000,
+    semantic_threshold: Optional[float] = None,
+) -> ResponseCache:
+    """Process-wide ResponseCache instance of the given options"""
+    return ResponseCache(ttl_seconds, max_entries, semantic_threshold)
@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+import re
+from typing import List, Set
+
+from langchain_core.documents import Document
+
+from task_whisperer.src.embedding.batching import get_encoding
+
+WORD_PATTERN = re.compile(r"\w+")
+TRIM_MARKER = " ..."
+
+
+@dataclass
+class AssembledContext:
+    """Class for keeping the similar tasks put into a prompt"""
+
+    similar_tasks: List[str] = field(default_factory=list)
+    n_tokens: int = 0
+    n_saved_tokens: int = 0
+    n_duplicates: int = 0
+
+
+def get_shingles(text: str, size: int = 3) -> Set[str]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def get_jaccard_similarity(shingles: Set[str], other_shingles: Set[str]) -> float:
+    if not shingles or not other_shingles:
+        return 0.0
+    return len(shingles & other_shingles) / len(shingles | other_shingles)
+
+
+class ContextAssembler:
+    """
+    Selects the similar tasks to put into a prompt. Retrieved tasks are
+    taken in order of relevance, chunks of an already taken issue and near
+    duplicates of taken tasks are skipped, and tasks are trimmed to fit a
+    token budget.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        max_task_tokens: int = 800,
+        min_task_tokens: int = 50,
+        similarity_threshold: float = 0.8,
+    ) -> None:
+        assert max_tokens > 0, "max_tokens must be positive"
+        assert max_task_tokens > 0, "max_task_tokens must be positive"
+        assert 0 < similarity_threshold <= 1, "similarity_threshold must be in (0, 1]"
+        self.max_tokens = max_tokens
+        self.max_task_tokens = max_task_tokens
+        self.min_task_tokens = min_task_tokens
+        self.similarity_threshold = similarity_threshold
+
+    def _is_duplicate(
+        self,
+        similar_task: Document,
+        shingles: Set[str],
+        selected_keys: Set[str],
+        selected_shingles: List[Set[str]],
+    ) -> bool:
+        # chunks of an issue share the issue key of their metadata
+        if similar_task.metadata.get("key") in selected_keys:
+            return True
+        return any(
+            get_jaccard_similarity(shingles, other_shingles)
+            >= self.similarity_threshold
+            for other_shingles in selected_shingles
+        )
+
+    def assemble(self, similar_tasks: List[Document]) -> AssembledContext:
+        """
+        Assemble the similar tasks of a prompt.
+
+        :param similar_tasks: documents of the retrieved similar tasks, most
+            relevant first
+        :type similar_tasks: List[Document]
+        :return: selected and trimmed similar tasks, their token count and
+            the tokens saved compared to putting every retrieved task into
+            the prompt
+        :rtype: AssembledContext
+        """
+        encoding = get_encoding()
+        context = AssembledContext()
+        selected_keys: Set[str] = set()
+        selected_shingles: List[Set[str]] = []
+        n_retrieved_tokens = 0
+
+        for similar_doc in similar_tasks:
+            similar_task = similar_doc.page_content
+            tokens = encoding.encode(similar_task, disallowed_special=())
+            n_retrieved_tokens += len(tokens)
+
+            shingles = get_shingles(similar_task)
+            if self._is_duplicate(
+                similar_doc, shingles, selected_keys, selected_shingles
+            ):
+                context.n_duplicates += 1
+                continue
+
+            n_available = min(self.max_task_tokens, self.max_tokens - context.n_tokens)
+            if len(tokens) > n_available:
+                # a task trimmed to a few tokens doesn't help the LLM
+                if n_available < self.min_task_tokens:
+                    continue
+                similar_task = encoding.decode(tokens[:n_available]) + TRIM_MARKER
+                tokens = tokens[:n_available]
+
+            context.similar_tasks.append(similar_task)
+            context.n_tokens += len(tokens)
+            if similar_doc.metadata.get("key"):
+                selected_keys.add(similar_doc.metadata["key"])
+            selected_shingles.append(shingles)
+
+        context.n_saved_tokens = n_retrieved_tokens - context.n_tokens
+        return context
@@ -1,16 +1,32 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
 import os
-from typing import List
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
 from jinja2 import Environment, FileSystemLoader
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_community.callbacks import get_openai_callback
+from langchain_community.callbacks.openai_info import (
+    OpenAICallbackHandler,
+    get_openai_token_cost_for_model,
+)
 
+from task_whisperer.src.embedding.batching import get_n_tokens
 from task_whisperer.src.task_generation.base import BaseTaskGenerator
+from task_whisperer.src.task_generation.cache import ResponseCache
+from task_whisperer.src.task_generation.context import (
+    AssembledContext,
+    ContextAssembler,
+)
 from task_whisperer.src.vector_store.base import BaseVectorStore
 
 
+logger = logging.getLogger(__name__)
+
 GPT_MODEL = "gpt-3.5-turbo"
 EMBEDDING_MODEL = "text-embedding-ada-002"
 TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "prompt_templates")
@@ -28,12 +44,21 @@ class OpenAITaskGenerator(BaseTaskGenerator):
         api_key: str,
         vector_store: BaseVectorStore,
         model: str = GPT_MODEL,
+        response_cache: Optional[ResponseCache] = None,
+        max_cache_temperature: float = 0.0,
+        context_assembler: Optional[ContextAssembler] = None,
     ) -> None:
         assert api_key, "api_key is required"
         assert model, "model is required"
         self.api_key = api_key
         self.model = model
         self.vector_store = vector_store
+        self.response_cache = response_cache
+        self.max_cache_temperature = max_cache_temperature
+        self.context_assembler = context_assembler
+        # one chat model, and so one HTTP connection pool, per generator.
+        # temperature is passed per call.
+        self.chat = ChatOpenAI(api_key=api_key, model_name=model)
 
     def get_system_prompt(self):
         with open(os.path.join(TEMPLATES_PATH, "system.txt"), "r") as f:
@@ -47,43 +72,359 @@ class OpenAITaskGenerator(BaseTaskGenerator):
 
         return template.render(similar_tasks=similar_tasks, task_summary=task_summary)
 
-    def get_answer(self, prompt, temperature: float = 0):
-        chat = ChatOpenAI(
-            api_key=self.api_key, model_name=self.model, temperature=temperature
-        )
-        messages = [
+    def build_user_prompt(
+        self, task_summary: str, similar_tasks: List[Document]
+    ) -> Tuple[str, AssembledContext]:
+        """User prompt with the similar tasks selected by the context assembler"""
+        if self.context_assembler is None:
+            context = AssembledContext(
+                similar_tasks=[
+                    similar_task.page_content for similar_task in similar_tasks
+                ]
+            )
+        else:
+            context = self.context_assembler.assemble(similar_tasks)
+        return self.get_user_prompt(task_summary, context.similar_tasks), context
+
+    def get_messages(self, prompt: str):
+        return [
             SystemMessage(content=self.get_system_prompt()),
             HumanMessage(content=prompt),
         ]
+
+    def _get_cached_answer(
+        self,
+        prompt: str,
+        temperature: float,
+        project: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Look up the answer of prompt in the response cache. Answers are
+        only cached up to max_cache_temperature, as they are expected to
+        vary above it.
+
+        :return: cache key (None if the answer is not to be cached),
+            semantic cache scope and the cached answer if any
+        :rtype: Tuple[Optional[str], Optional[str], Optional[str]]
+        """
+        if self.response_cache is None or temperature > self.max_cache_temperature:
+            return None, None, None
+
+        cache_key = self.response_cache.get_key(
+            self.model, temperature, self.get_system_prompt(), prompt
+        )
+        if isinstance(project, list):
+            project = ",".join(sorted(project))
+        scope = f"{self.model}:{temperature}:{project}" if project else None
+        answer = self.response_cache.get(cache_key, scope, query_embedding)
+        return cache_key, scope, answer
+
+    def _get_query_embedding(
+        self, task_summary: str, temperature: float
+    ) -> Optional[List[float]]:
+        """Embedding of task_summary if it can be used for semantic caching"""
+        if (
+            self.response_cache is None
+            or not self.response_cache.semantic_threshold
+            or temperature > self.max_cache_temperature
+        ):
+            return None
+        query_embedding, _ = self.vector_store.get_embedding(task_summary)
+        return query_embedding
+
+    async def _aget_query_embedding(
+        self, task_summary: str, temperature: float
+    ) -> Optional[List[float]]:
+        if (
+            self.response_cache is None
+            or not self.response_cache.semantic_threshold
+            or temperature > self.max_cache_temperature
+        ):
+            return None
+        query_embedding, _ = await self.vector_store.aget_embedding(task_summary)
+        return query_embedding
+
+    def get_answer(
+        self,
+        prompt,
+        temperature: float = 0,
+        project: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ):
+        cache_key, scope, cached_answer = self._get_cached_answer(
+            prompt, temperature, project, query_embedding
+        )
+        if cached_answer is not None:
+            return AIMessage(content=cached_answer), OpenAICallbackHandler()
+
+        messages = self.get_messages(prompt)
         with get_openai_callback() as cb:
-            response = chat.invoke(messages)
-            return response, cb
+            response = self.chat.invoke(messages, temperature=temperature)
+
+        if cache_key:
+            self.response_cache.set(cache_key, response.content, scope, query_embedding)
+        return response, cb
+
+    async def aget_answer(
+        self,
+        prompt,
+        temperature: float = 0,
+        project: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+    ):
+        cache_key, scope, cached_answer = self._get_cached_answer(
+            prompt, temperature, project, query_embedding
+        )
+        if cached_answer is not None:
+            return AIMessage(content=cached_answer), OpenAICallbackHandler()
+
+        messages = self.get_messages(prompt)
+        with get_openai_callback() as cb:
+            response = await self.chat.ainvoke(messages, temperature=temperature)
+
+        if cache_key:
+            self.response_cache.set(cache_key, response.content, scope, query_embedding)
+        return response, cb
+
+    def stream_answer(self, prompt: str, temperature: float = 0) -> Iterator[str]:
+        for chunk in self.chat.stream(
+            self.get_messages(prompt), temperature=temperature
+        ):
+            if chunk.content:
+                yield chunk.content
+
+    def set_usage(
+        self, callback: OpenAICallbackHandler, prompt: str, answer: str
+    ) -> None:
+        """
+        Set token usage of a streamed answer on callback. Streamed responses
+        don't report usage, so tokens are counted with tiktoken.
+
+        :param callback: callback handler to set the token usage and cost on
+        :type callback: OpenAICallbackHandler
+        :param prompt: user prompt
+        :type prompt: str
+        :param answer: streamed answer
+        :type answer: str
+        """
+        callback.successful_requests += 1
+        callback.prompt_tokens += get_n_tokens(self.get_system_prompt())
+        callback.prompt_tokens += get_n_tokens(prompt)
+        callback.completion_tokens += get_n_tokens(answer)
+        callback.total_tokens = callback.prompt_tokens + callback.completion_tokens
+        try:
+            callback.total_cost += get_openai_token_cost_for_model(
+                self.model, callback.prompt_tokens
+            ) + get_openai_token_cost_for_model(
+                self.model, callback.completion_tokens, is_completion=True
+            )
+        except ValueError:
+            # cost of unknown models can't be calculated
+            pass
+
+    def _get_similar_tasks(
+        self,
+        project: Union[str, List[str]],
+        task_summary: str,
+        task_desc: str = "",
+        n_similar_tasks: int = 5,
+    ) -> Tuple[List[Document], int]:
+        if n_similar_tasks > 0 and isinstance(project, list):
+            return self.vector_store.similarity_search_multi(
+                project, task_summary, task_desc, n_similar=n_similar_tasks
+            )
+        if n_similar_tasks > 0:
+            return self.vector_store.similarity_search(
+                project, task_summary, task_desc, n_similar=n_similar_tasks
+            )
+        return [], 0
 
     def create_task_description(
         self,
-        project: str,
+        project: Union[str, List[str]],
         task_summary: str,
         task_desc: str = "",
         n_similar_tasks: int = 5,
         temperature: float = 0,
     ):
+        similar_tasks, n_tokens = self._get_similar_tasks(
+            project, task_summary, task_desc, n_similar_tasks
+        )
+        return self.generate_task_description(
+            task_summary, similar_tasks, n_tokens, temperature, project
+        )
+
+    async def acreate_task_description(
+        self,
+        project: str,
+        task_summary: str,
+        task_desc: str = "",
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+    ) -> Dict[str, Any]:
+        """
+        Async counterpart of create_task_description. Similar tasks are
+        searched while the query embedding for the response cache is computed.
+        """
         if n_similar_tasks > 0:
-            similar_tasks, n_tokens = self.vector_store.similarity_search(
+            similar_task_search = self.vector_store.asimilarity_search(
                 project, task_summary, task_desc, n_similar=n_similar_tasks
             )
         else:
-            similar_tasks = []
-            n_tokens = 0
+            similar_task_search = asyncio.sleep(0, result=([], 0))
 
-        prompt = self.get_user_prompt(task_summary, similar_tasks)
-        answer, callback = self.get_answer(prompt, temperature)
+        (similar_tasks, n_tokens), query_embedding = await asyncio.gather(
+            similar_task_search,
+            self._aget_query_embedding(task_summary, temperature),
+        )
+        prompt, context = self.build_user_prompt(task_summary, similar_tasks)
+        answer, callback = await self.aget_answer(
+            prompt,
+            temperature,
+            project=project,
+            query_embedding=query_embedding,
+        )
+        logger.debug("Token usage of %r:\n%s", task_summary, callback)
 
-        # TODO: use a logger here
-        print(callback)
+        return {
+            "answer": answer.content,
+            "callback": callback,
+            "n_tokens": n_tokens,
+            "n_saved_tokens": context.n_saved_tokens,
+            "similar_tasks": context.similar_tasks,
+        }
+
+    def stream_task_description(
+        self,
+        project: Union[str, List[str]],
+        task_summary: str,
+        task_desc: str = "",
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+    ) -> Dict[str, Any]:
+        """
+        Same as create_task_description, but the answer is streamed. Similar
+        tasks are searched in every project when a list of projects is given.
+
+        :return: response with "answer_stream" yielding the answer tokens.
+            "callback" is filled with the token usage once the stream ends.
+        :rtype: Dict[str, Any]
+        """
+        similar_tasks, n_tokens = self._get_similar_tasks(
+            project, task_summary, task_desc, n_similar_tasks
+        )
+        prompt, context = self.build_user_prompt(task_summary, similar_tasks)
+        query_embedding = self._get_query_embedding(task_summary, temperature)
+        cache_key, scope, cached_answer = self._get_cached_answer(
+            prompt, temperature, project, query_embedding
+        )
+        callback = OpenAICallbackHandler()
+
+        def _answer_stream() -> Iterator[str]:
+            if cached_answer is not None:
+                yield cached_answer
+                return
+
+            answer_parts = []
+            for token in self.stream_answer(prompt, temperature):
+                answer_parts.append(token)
+                yield token
+
+            answer = "".join(answer_parts)
+            self.set_usage(callback, prompt, answer)
+            if cache_key:
+                self.response_cache.set(cache_key, answer, scope, query_embedding)
+            logger.debug("Token usage of %r:\n%s", task_summary, callback)
+
+        return {
+            "answer_stream": _answer_stream(),
+            "callback": callback,
+            "n_tokens": n_tokens,
+            "n_saved_tokens": context.n_saved_tokens,
+            "similar_tasks": context.similar_tasks,
+        }
+
+    def create_task_descriptions(
+        self,
+        project: str,
+        task_summaries: List[str],
+        n_similar_tasks: int = 5,
+        temperature: float = 0,
+        max_workers: int = 8,
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Create task descriptions of many task summaries. Similar tasks of all
+        summaries are retrieved at once, LLM calls run in a bounded pool.
+
+        :param project: project key
+        :type project: str
+        :param task_summaries: task summaries to create descriptions for
+        :type task_summaries: List[str]
+        :param n_similar_tasks: number of similar tasks per summary
+        :type n_similar_tasks: int
+        :param temperature: LLM temperature
+        :type temperature: float
+        :param max_workers: maximum number of concurrent LLM calls
+        :type max_workers: int
+        :return: (index of the summary, response) pairs as soon as each
+            response is ready. Failed items have an "error" in the response.
+        :rtype: Iterator[Tuple[int, Dict[str, Any]]]
+        """
+        if n_similar_tasks > 0 and task_summaries:
+            similar_tasks, n_tokens = self.vector_store.similarity_search_batch(
+                project, task_summaries, n_similar=n_similar_tasks
+            )
+        else:
+            similar_tasks = [[] for _ in task_summaries]
+            n_tokens = [0 for _ in task_summaries]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    self.generate_task_description,
+                    task_summary,
+                    similar_tasks[i],
+                    n_tokens[i],
+                    temperature,
+                    project,
+                ): i
+                for i, task_summary in enumerate(task_summaries)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    yield i, future.result()
+                except Exception as e:
+                    yield i, {
+                        "error": str(e),
+                        "similar_tasks": [
+                            similar_task.page_content
+                            for similar_task in similar_tasks[i]
+                        ],
+                    }
+
+    def generate_task_description(
+        self,
+        task_summary: str,
+        similar_tasks: List[Document],
+        n_tokens: int = 0,
+        temperature: float = 0,
+        project: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        prompt, context = self.build_user_prompt(task_summary, similar_tasks)
+        answer, callback = self.get_answer(
+            prompt,
+            temperature,
+            project=project,
+            query_embedding=self._get_query_embedding(task_summary, temperature),
+        )
+        logger.debug("Token usage of %r:\n%s", task_summary, callback)
 
         return {
             "answer": answer.content,
             "callback": callback,
             "n_tokens": n_tokens,
-            "similar_tasks": similar_tasks,
+            "n_saved_tokens": context.n_saved_tokens,
+            "similar_tasks": context.similar_tasks,
         }
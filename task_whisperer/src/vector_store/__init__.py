@@ -1,7 +1,18 @@
 from .base import BaseVectorStore
+from .bm25 import BM25Index
+from .cache import FaissIndexCache, get_faiss_index_cache
+from .duplicates import DuplicateCluster, find_duplicate_clusters
 from .factory import vector_store_factory
 from .faiss_store import FaissVectorStore
 
 vector_store_factory.register("faiss", FaissVectorStore)
 
-__all__ = ["FaissVectorStore", "vector_store_factory"]
+__all__ = [
+    "BM25Index",
+    "DuplicateCluster",
+    "FaissIndexCache",
+    "FaissVectorStore",
+    "find_duplicate_clusters",
+    "get_faiss_index_cache",
+    "vector_store_factory",
+]
@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
 
 from task_whisperer.src.embedding.base import BaseEmbeddings
+from task_whisperer.src.vector_store.cache import FaissIndexCache
 
 
 class BaseVectorStore(ABC):
@@ -9,7 +12,13 @@ class BaseVectorStore(ABC):
 
     @abstractmethod
     def __init__(
-        self, faiss_index_root_path: str, embedding_generator: BaseEmbeddings
+        self,
+        faiss_index_root_path: str,
+        embedding_generator: BaseEmbeddings,
+        index_cache: Optional[FaissIndexCache] = None,
+        mmap: bool = False,
+        index_options: Optional[Dict[str, Any]] = None,
+        retrieval_options: Optional[Dict[str, Any]] = None,
     ) -> None:
         pass
 
@@ -17,6 +26,10 @@ class BaseVectorStore(ABC):
     def read_embeddings(self, project: str):
         pass
 
+    @abstractmethod
+    def has_index(self, project: str) -> bool:
+        pass
+
     @abstractmethod
     def get_embedding(
         self, task_summary: str, task_desc: str = ""
@@ -30,5 +43,51 @@ class BaseVectorStore(ABC):
         task_summary: str,
         task_desc: str = "",
         n_similar: int = 5,
-    ) -> Tuple[List[str], int]:
+    ) -> Tuple[List[Document], int]:
+        pass
+
+    @abstractmethod
+    def similarity_search_multi(
+        self,
+        projects: List[str],
+        task_summary: str,
+        task_desc: str = "",
+        n_similar: int = 5,
+        max_workers: int = 8,
+    ) -> Tuple[List[Document], int]:
+        pass
+
+    @abstractmethod
+    def similar_issues_by_key(
+        self, project: str, key: str, n_similar: int = 5
+    ) -> List[Document]:
+        pass
+
+    @abstractmethod
+    def build_neighbours(self, project: str, k: int = 10) -> str:
+        pass
+
+    @abstractmethod
+    async def aget_embedding(
+        self, task_summary: str, task_desc: str = ""
+    ) -> Tuple[List[float], int]:
+        pass
+
+    @abstractmethod
+    async def asimilarity_search(
+        self,
+        project: str,
+        task_summary: str,
+        task_desc: str = "",
+        n_similar: int = 5,
+    ) -> Tuple[List[Document], int]:
+        pass
+
+    @abstractmethod
+    def similarity_search_batch(
+        self,
+        project: str,
+        task_summaries: List[str],
+        n_similar: int = 5,
+    ) -> Tuple[List[List[Document]], List[int]]:
         pass
@@ -0,0 +1,232 @@
+from collections import Counter
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_community.vectorstores.faiss import FAISS
+from langchain_core.documents import Document
+import numpy as np
+
+BM25_FILE_NAME = "bm25.npz"
+# issue keys (e.g. PROJ-123) are kept as a single token
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]*-\d+|\w+")
+ISSUE_KEY_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9]*-\d+$")
+# snake_case, camelCase, dotted names or words with digits
+IDENTIFIER_PATTERN = re.compile(r"^(?:\w*_\w*|[a-z]+[A-Z]\w*|\w+(?:\.\w+)+|\w*\d\w*)$")
+
+
+def pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Strings as one UTF-8 buffer and their offsets into it. Fixed-width
+    NumPy string arrays would take the length of the longest string for
+    every string.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(buffer: np.ndarray, offsets: np.ndarray) -> List[str]:
+    data = buffer.tobytes()
+    return [
+        data[start:end].decode("utf-8")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def get_identifier_ratio(text: str) -> float:
+    """Ratio of the words of text which are issue keys or identifiers"""
+    words = [word.strip(".,;:!?()[]{}\"'`") for word in text.split()]
+    words = [word for word in words if word]
+    if not words:
+        return 0.0
+
+    n_identifiers = sum(
+        1
+        for word in words
+        if ISSUE_KEY_PATTERN.match(word) or IDENTIFIER_PATTERN.match(word)
+    )
+    return n_identifiers / len(words)
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over the documents of a FAISS index. Postings
+    are kept in CSR layout (term offsets into document and term frequency
+    arrays), so that the index is saved and loaded as a few NumPy arrays.
+    """
+
+    def __init__(
+        self,
+        doc_ids: List[str],
+        doc_lens: np.ndarray,
+        terms: List[str],
+        offsets: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_tfs: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.doc_ids = doc_ids
+        self.doc_lens = doc_lens
+        self.term_positions: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.k1 = k1
+        self.b = b
+        self.avg_doc_len = float(doc_lens.mean()) if len(doc_lens) else 0.0
+
+    @classmethod
+    def from_texts(
+        cls, doc_ids: List[str], texts: Iterable[str], **kwargs
+    ) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = []
+        for doc_no, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_no, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        postings_docs = np.empty(offsets[-1], dtype=np.int32)
+        postings_tfs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            term_docs, term_tfs = zip(*postings[term])
+            postings_docs[offsets[i] : offsets[i + 1]] = term_docs
+            postings_tfs[offsets[i] : offsets[i + 1]] = term_tfs
+
+        return cls(
+            doc_ids,
+            np.asarray(doc_lens, dtype=np.float32),
+            terms,
+            offsets,
+            postings_docs,
+            postings_tfs,
+            **kwargs,
+        )
+
+    @classmethod
+    def from_faiss(cls, faiss_db: FAISS, **kwargs) -> "BM25Index":
+        doc_ids, texts = [], []
+        for doc_id in faiss_db.index_to_docstore_id.values():
+            doc = faiss_db.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                doc_ids.append(doc_id)
+                # issue key is indexed too, so that issues are found by key
+                texts.append(f"{doc.metadata.get('key', '')} {doc.page_content}")
+        return cls.from_texts(doc_ids, texts, **kwargs)
+
+    def save(self, path: str) -> None:
+        terms = sorted(self.term_positions, key=self.term_positions.get)
+        doc_ids_buffer, doc_ids_offsets = pack_strings(self.doc_ids)
+        terms_buffer, terms_offsets = pack_strings(terms)
+        # np.savez appends .npz to paths without it
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                doc_ids_buffer=doc_ids_buffer,
+                doc_ids_offsets=doc_ids_offsets,
+                doc_lens=self.doc_lens,
+                terms_buffer=terms_buffer,
+                terms_offsets=terms_offsets,
+                offsets=self.offsets,
+                postings_docs=self.postings_docs,
+                postings_tfs=self.postings_tfs,
+            )
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as arrays:
+            if "terms_buffer" in arrays:
+                doc_ids = unpack_strings(
+                    arrays["doc_ids_buffer"], arrays["doc_ids_offsets"]
+                )
+                terms = unpack_strings(arrays["terms_buffer"], arrays["terms_offsets"])
+            else:
+                # fixed-width string arrays of indices saved by earlier versions
+                doc_ids = arrays["doc_ids"].tolist()
+                terms = arrays["terms"].tolist()
+            return cls(
+                doc_ids,
+                arrays["doc_lens"],
+                terms,
+                arrays["offsets"],
+                arrays["postings_docs"],
+                arrays["postings_tfs"],
+                **kwargs,
+            )
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Top k documents of query by BM25 score.
+
+        :param query: query text
+        :type query: str
+        :param k: number of documents
+        :type k: int
+        :return: (document id, score) pairs, highest score first. Documents
+            sharing no term with the query are not returned.
+        :rtype: List[Tuple[str, float]]
+        """
+        n_docs = len(self.doc_ids)
+        if not n_docs or k <= 0:
+            return []
+
+        scores = np.zeros(n_docs, dtype=np.float32)
+        # documents are all empty when the average length is 0
+        avg_doc_len = self.avg_doc_len or 1.0
+        for term in set(tokenize(query)):
+            position = self.term_positions.get(term)
+            if position is None:
+                continue
+
+            start, end = self.offsets[position], self.offsets[position + 1]
+            docs = self.postings_docs[start:end]
+            tfs = self.postings_tfs[start:end]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[docs] / avg_doc_len)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        k = min(k, n_docs)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.doc_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def load_bm25_index(embedding_path: str) -> Optional[BM25Index]:
+    """BM25 index saved with a FAISS index, None for indices saved without it"""
+    bm25_path = os.path.join(embedding_path, BM25_FILE_NAME)
+    if not os.path.exists(bm25_path):
+        return None
+    return BM25Index.load(bm25_path)
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse rankings of document ids with Reciprocal Rank Fusion, a document
+    scores sum(1 / (k + rank)) over the rankings it appears in.
+
+    :param rankings: document ids, best first, of each retriever
+    :type rankings: List[List[str]]
+    :param k: constant damping the weight of top ranks
+    :type k: int
+    :return: (document id, fused score) pairs, highest score first
+    :rtype: List[Tuple[str, float]]
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda doc_score: doc_score[1], reverse=True)
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+from functools import lru_cache
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+INDEX_FILE_NAMES = ("index.faiss", "index.pkl", "docstore.sqlite")
+# files of the other kinds of indices saved with a FAISS index
+INDEX_KIND_FILE_NAMES = {
+    "bm25": ("bm25.npz",),
+    "neighbours": ("neighbours.json",),
+}
+
+
+class FaissIndexCache:
+    """
+    Process-wide LRU cache of loaded FAISS indices, bounded by a memory
+    budget. An entry is reloaded when the files of the index change on disk.
+    """
+
+    def __init__(self, max_bytes: int = 1024**3) -> None:
+        assert max_bytes > 0, "max_bytes must be positive"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Tuple, Any, int]]" = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_signature(embedding_path: str, kind: Optional[str] = None) -> Tuple:
+        signature = []
+        for file_name in INDEX_KIND_FILE_NAMES.get(kind, INDEX_FILE_NAMES):
+            file_path = os.path.join(embedding_path, file_name)
+            try:
+                stat = os.stat(file_path)
+                signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((file_name, None, 0))
+        return tuple(signature)
+
+    def get(
+        self,
+        embedding_path: str,
+        loader: Callable[[], Any],
+        kind: Optional[str] = None,
+    ) -> Any:
+        """
+        Get the loaded index of embedding_path, load it with loader if it is
+        not cached or its files have changed since it was cached.
+
+        :param embedding_path: directory of the saved index
+        :type embedding_path: str
+        :param loader: callable loading the index from embedding_path
+        :type loader: Callable[[], Any]
+        :param kind: kind of the index if not the FAISS index, e.g. "bm25"
+        :type kind: Optional[str]
+        :return: loaded index
+        :rtype: Any
+        """
+        signature = self.get_signature(embedding_path, kind)
+        key = f"{embedding_path}#{kind}" if kind else embedding_path
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        index = loader()
+        # on-disk size is used as an estimate of the memory footprint
+        n_bytes = sum(file_size for _, _, file_size in signature)
+
+        with self._lock:
+            self._discard(key)
+            if n_bytes <= self.max_bytes:
+                self._entries[key] = (signature, index, n_bytes)
+                self._n_bytes += n_bytes
+                self._evict()
+
+        return index
+
+    def invalidate(self, embedding_path: Optional[str] = None) -> None:
+        with self._lock:
+            if embedding_path is None:
+                self._entries.clear()
+                self._n_bytes = 0
+            else:
+                self._discard(embedding_path)
+                for kind in INDEX_KIND_FILE_NAMES:
+                    self._discard(f"{embedding_path}#{kind}")
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._n_bytes -= entry[2]
+
+    def _evict(self) -> None:
+        while self._n_bytes > self.max_bytes and self._entries:
+            _, (_, _, n_bytes) = self._entries.popitem(last=False)
+            self._n_bytes -= n_bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "n_bytes": self._n_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_faiss_index_cache(max_bytes: int = 1024**3) -> FaissIndexCache:
+    """Process-wide FaissIndexCache instance of the given memory budget"""
+    return FaissIndexCache(max_bytes)
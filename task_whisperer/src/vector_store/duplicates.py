@@ -0,0 +1,144 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+from langchain_community.vectorstores.faiss import FAISS
+import numpy as np
+
+from task_whisperer.src.vector_store.neighbours import (
+    get_index_keys,
+    get_index_vectors,
+)
+
+
+@dataclass
+class DuplicateCluster:
+    """Class for keeping a cluster of near-duplicate issues"""
+
+    keys: List[str]
+    n_pairs: int
+    max_similarity: float
+
+
+class UnionFind:
+    """Disjoint sets of items with path compression and union by size"""
+
+    def __init__(self) -> None:
+        self._parents: Dict[str, str] = {}
+        self._sizes: Dict[str, int] = {}
+
+    def find(self, item: str) -> str:
+        if item not in self._parents:
+            self._parents[item] = item
+            self._sizes[item] = 1
+            return item
+
+        root = item
+        while self._parents[root] != root:
+            root = self._parents[root]
+        while self._parents[item] != root:
+            self._parents[item], item = root, self._parents[item]
+        return root
+
+    def union(self, item: str, other_item: str) -> str:
+        root, other_root = self.find(item), self.find(other_item)
+        if root == other_root:
+            return root
+        if self._sizes[root] < self._sizes[other_root]:
+            root, other_root = other_root, root
+        self._parents[other_root] = root
+        self._sizes[root] += self._sizes[other_root]
+        return root
+
+    def groups(self) -> List[List[str]]:
+        groups: Dict[str, List[str]] = {}
+        for item in self._parents:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+def iter_similar_pairs(
+    vectors: np.ndarray, threshold: float, block_size: int = 2048
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Blocked self-join of vectors by cosine similarity. Only blocks on and
+    above the diagonal are multiplied, so every pair is compared once and
+    at most block_size x block_size similarities are held at once.
+
+    :param vectors: vectors to join, one per row
+    :type vectors: np.ndarray
+    :param threshold: minimum cosine similarity of a pair
+    :type threshold: float
+    :param block_size: number of rows and columns of a block
+    :type block_size: int
+    :return: (rows, columns, similarities) of the pairs above threshold in
+        each block, rows are always less than columns
+    :rtype: Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]
+    """
+    assert block_size > 0, "block_size must be positive"
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, np.finfo(np.float32).tiny)
+    n_vectors = len(vectors)
+
+    for row_start in range(0, n_vectors, block_size):
+        row_block = vectors[row_start : row_start + block_size]
+        for col_start in range(row_start, n_vectors, block_size):
+            similarities = row_block @ vectors[col_start : col_start + block_size].T
+            rows, cols = np.nonzero(similarities >= threshold)
+            rows, cols = rows + row_start, cols + col_start
+            upper = rows < cols
+            yield rows[upper], cols[upper], similarities[
+                rows[upper] - row_start, cols[upper] - col_start
+            ]
+
+
+def find_duplicate_clusters(
+    faiss_db: FAISS, threshold: float = 0.95, block_size: int = 2048
+) -> List[DuplicateCluster]:
+    """
+    Cluster near-duplicate issues of an index. Chunks of two issues above
+    threshold cosine similarity link the issues, clusters are the connected
+    components of the links.
+
+    :param faiss_db: index of a project
+    :type faiss_db: FAISS
+    :param threshold: minimum cosine similarity of duplicates
+    :type threshold: float
+    :param block_size: number of rows and columns of a block of the join
+    :type block_size: int
+    :return: clusters of at least two issues, largest first
+    :rtype: List[DuplicateCluster]
+    """
+    assert 0 < threshold <= 1, "threshold must be in (0, 1]"
+    if faiss_db.index.ntotal < 2:
+        return []
+
+    keys = np.asarray(get_index_keys(faiss_db), dtype=object)
+    vectors = get_index_vectors(faiss_db)
+
+    union_find = UnionFind()
+    links: List[Tuple[str, float]] = []
+    for rows, cols, similarities in iter_similar_pairs(vectors, threshold, block_size):
+        for key, other_key, similarity in zip(keys[rows], keys[cols], similarities):
+            # chunks of the same issue aren't duplicates
+            if key is None or other_key is None or key == other_key:
+                continue
+            union_find.union(key, other_key)
+            links.append((key, float(similarity)))
+
+    n_pairs: Dict[str, int] = {}
+    max_similarities: Dict[str, float] = {}
+    for key, similarity in links:
+        root = union_find.find(key)
+        n_pairs[root] = n_pairs.get(root, 0) + 1
+        max_similarities[root] = max(max_similarities.get(root, 0.0), similarity)
+
+    clusters = [
+        DuplicateCluster(
+            keys=sorted(cluster_keys),
+            n_pairs=n_pairs[union_find.find(cluster_keys[0])],
+            max_similarity=max_similarities[union_find.find(cluster_keys[0])],
+        )
+        for cluster_keys in union_find.groups()
+    ]
+    return sorted(clusters, key=lambda cluster: len(cluster.keys), reverse=True)
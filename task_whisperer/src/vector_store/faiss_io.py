@@ -0,0 +1,452 @@
+from collections.abc import Mapping
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores.faiss import FAISS, dependable_faiss_import
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+from task_whisperer.src.vector_store.bm25 import BM25_FILE_NAME, BM25Index
+from task_whisperer.src.vector_store.neighbours import (
+    NEIGHBOURS_FILE_NAME,
+    compute_neighbours,
+    make_reconstructable,
+    save_neighbours,
+)
+
+DOCSTORE_FILE_NAME = "docstore.sqlite"
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+# faiss warns when an IVF index is trained with less points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore of a FAISS index backed by SQLite, so that documents
+    are read from the OS page cache on demand instead of being unpickled
+    into the memory of every process.
+    """
+
+    def __init__(self, docstore_path: str) -> None:
+        assert os.path.exists(docstore_path), f"{docstore_path} does not exist"
+        self.docstore_path = docstore_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            f"file:{docstore_path}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_content, metadata FROM documents WHERE id = ?",
+                (search,),
+            ).fetchone()
+
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def get_doc_id(self, position: int) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id FROM index_map WHERE position = ?", (position,)
+            ).fetchone()
+
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def get_positions(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position FROM index_map ORDER BY position"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_positions(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM index_map").fetchone()[0]
+
+
+class SQLiteIndexToDocstoreId(Mapping):
+    """Lazy index position to document id mapping of a SQLiteDocstore"""
+
+    def __init__(self, docstore: SQLiteDocstore) -> None:
+        self.docstore = docstore
+
+    def __getitem__(self, position: int) -> str:
+        return self.docstore.get_doc_id(int(position))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.docstore.get_positions())
+
+    def __len__(self) -> int:
+        return self.docstore.count_positions()
+
+
+def write_sqlite_docstore(faiss_db: FAISS, docstore_path: str) -> None:
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)
+
+    conn = sqlite3.connect(docstore_path)
+    try:
+        conn.execute(
+            "CREATE TABLE documents "
+            "(id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE index_map (position INTEGER PRIMARY KEY, doc_id TEXT)"
+        )
+
+        rows = []
+        for doc_id in faiss_db.index_to_docstore_id.values():
+            doc = faiss_db.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                rows.append(
+                    (doc_id, doc.page_content, json.dumps(doc.metadata, default=str))
+                )
+        conn.executemany("INSERT INTO documents VALUES (?, ?, ?)", rows)
+        conn.executemany(
+            "INSERT INTO index_map VALUES (?, ?)",
+            [
+                (int(position), doc_id)
+                for position, doc_id in faiss_db.index_to_docstore_id.items()
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def save_faiss_index(
+    faiss_db: FAISS,
+    embedding_path: str,
+    write_docstore: bool = False,
+    n_neighbours: int = 0,
+) -> None:
+    """
+    Save an index with a BM25 index of its documents and, optionally, the
+    nearest issues of each issue. Files are written to a temporary directory
+    first and moved into place, so that running readers never see a
+    partially written file.
+
+    :param faiss_db: index to save
+    :type faiss_db: FAISS
+    :param embedding_path: directory of the index
+    :type embedding_path: str
+    :param write_docstore: also write the SQLite docstore used by mmap loading
+    :type write_docstore: bool
+    :param n_neighbours: number of nearest issues to precompute per issue,
+        0 to not precompute them
+    :type n_neighbours: int
+    """
+    tmp_path = f"{embedding_path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    faiss_db.save_local(tmp_path)
+    if write_docstore:
+        write_sqlite_docstore(faiss_db, os.path.join(tmp_path, DOCSTORE_FILE_NAME))
+    # lexical index of the same documents, used by hybrid retrieval
+    BM25Index.from_faiss(faiss_db).save(os.path.join(tmp_path, BM25_FILE_NAME))
+    if n_neighbours > 0:
+        save_neighbours(
+            compute_neighbours(faiss_db, n_neighbours),
+            os.path.join(tmp_path, NEIGHBOURS_FILE_NAME),
+        )
+
+    os.makedirs(embedding_path, exist_ok=True)
+    for file_name in os.listdir(tmp_path):
+        os.replace(
+            os.path.join(tmp_path, file_name), os.path.join(embedding_path, file_name)
+        )
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    # files of a previous version of the index which weren't written now
+    # would be stale
+    stale_file_names = []
+    if not write_docstore:
+        stale_file_names.append(DOCSTORE_FILE_NAME)
+    if n_neighbours <= 0:
+        stale_file_names.append(NEIGHBOURS_FILE_NAME)
+    for file_name in stale_file_names:
+        file_path = os.path.join(embedding_path, file_name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def get_index_factory_string(
+    dimension: int, n_vectors: int, index_options: Dict[str, Any]
+) -> str:
+    """
+    FAISS index factory string of the configured index type. IVF indices
+    need enough vectors to train their centroids, small projects therefore
+    get less centroids or an exact flat index.
+
+    :param dimension: dimension of the vectors
+    :type dimension: int
+    :param n_vectors: number of vectors to train the index with
+    :type n_vectors: int
+    :param index_options: index options of the vector store config
+    :type index_options: Dict[str, Any]
+    :raises ValueError: if pq_m doesn't divide the dimension of an ivf_pq index
+    :return: index factory string
+    :rtype: str
+    """
+    index_type = index_options.get("type", "flat")
+    assert index_type in INDEX_TYPES, f"index type must be one of {INDEX_TYPES}"
+
+    if index_type == "hnsw":
+        return f"HNSW{index_options.get('m', 32)},Flat"
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = min(
+            index_options.get("nlist", 1024), n_vectors // MIN_POINTS_PER_CENTROID
+        )
+        if nlist <= 0:
+            return "Flat"
+        if index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+
+        pq_m = index_options.get("pq_m", 64)
+        pq_nbits = index_options.get("pq_nbits", 8)
+        if dimension % pq_m != 0:
+            raise ValueError(
+                f"pq_m ({pq_m}) must divide the vector dimension ({dimension}) "
+                "of an ivf_pq index"
+            )
+        if n_vectors >= 2**pq_nbits:
+            return f"IVF{nlist},PQ{pq_m}x{pq_nbits}"
+
+    return "Flat"
+
+
+def get_index_type(index: Any) -> str:
+    faiss = dependable_faiss_import()
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+
+def set_search_parameters(index: Any, index_options: Dict[str, Any]) -> None:
+    faiss = dependable_faiss_import()
+    index_type = get_index_type(index)
+    parameter_space = faiss.ParameterSpace()
+    if index_type in ("ivf_flat", "ivf_pq") and "nprobe" in index_options:
+        parameter_space.set_index_parameter(index, "nprobe", index_options["nprobe"])
+    elif index_type == "hnsw" and "ef_search" in index_options:
+        parameter_space.set_index_parameter(
+            index, "efSearch", index_options["ef_search"]
+        )
+
+
+class FaissIndexBuilder:
+    """
+    Builds an index of the configured type (flat, ivf_flat, hnsw or ivf_pq)
+    from batches of embedded texts. Vectors are only buffered until there are
+    enough of them to train an IVF index, later batches are added directly.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, index_options: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.embeddings = embeddings
+        self.index_options = index_options or {}
+        self.faiss_db: Optional[FAISS] = None
+        self._buffer: List[Tuple[str, List[float], Dict, str]] = []
+
+    @property
+    def n_train(self) -> int:
+        """Number of vectors to buffer before the index is created"""
+        index_type = self.index_options.get("type", "flat")
+        if index_type not in ("ivf_flat", "ivf_pq"):
+            return 0
+
+        n_train = self.index_options.get("nlist", 1024) * MIN_POINTS_PER_CENTROID
+        if index_type == "ivf_pq":
+            n_train = max(n_train, 2 ** self.index_options.get("pq_nbits", 8))
+        return n_train
+
+    def add(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str],
+    ) -> None:
+        if self.faiss_db is not None:
+            self.faiss_db.add_embeddings(
+                zip(texts, vectors), metadatas=metadatas, ids=ids
+            )
+            return
+
+        self._buffer.extend(zip(texts, vectors, metadatas, ids))
+        if self._buffer and len(self._buffer) >= self.n_train:
+            self._create_index()
+
+    def _create_index(self) -> None:
+        faiss = dependable_faiss_import()
+        texts, vectors, metadatas, ids = map(list, zip(*self._buffer))
+        self._buffer = []
+        vector_array = np.asarray(vectors, dtype=np.float32)
+        n_vectors, dimension = vector_array.shape
+
+        index = faiss.index_factory(
+            dimension,
+            get_index_factory_string(dimension, n_vectors, self.index_options),
+        )
+        if get_index_type(index) == "hnsw":
+            faiss.downcast_index(index).hnsw.efConstruction = self.index_options.get(
+                "ef_construction", 40
+            )
+        if not index.is_trained:
+            index.train(vector_array)
+        set_search_parameters(index, self.index_options)
+
+        self.faiss_db = FAISS(self.embeddings, index, InMemoryDocstore(), {})
+        self.faiss_db.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+
+    def build(self) -> FAISS:
+        """
+        Create the index from the buffered vectors if it isn't created yet,
+        small projects get less centroids or a flat index.
+
+        :return: index containing every added text
+        :rtype: FAISS
+        """
+        if self.faiss_db is None:
+            assert self._buffer, "no vectors were added to the index"
+            self._create_index()
+        return self.faiss_db
+
+
+def build_faiss_index(
+    texts: List[str],
+    vectors: List[List[float]],
+    embeddings: Embeddings,
+    metadatas: List[Dict],
+    ids: List[str],
+    index_options: Optional[Dict[str, Any]] = None,
+) -> FAISS:
+    """
+    Build an index of the configured type (flat, ivf_flat, hnsw or ivf_pq)
+    from already embedded texts.
+
+    :param texts: texts of the documents
+    :type texts: List[str]
+    :param vectors: embeddings of the texts
+    :type vectors: List[List[float]]
+    :param embeddings: embeddings used to embed queries
+    :type embeddings: Embeddings
+    :param metadatas: metadata of the documents
+    :type metadatas: List[Dict]
+    :param ids: ids of the documents
+    :type ids: List[str]
+    :param index_options: index options of the vector store config
+    :type index_options: Optional[Dict[str, Any]]
+    :return: index containing the documents
+    :rtype: FAISS
+    """
+    builder = FaissIndexBuilder(embeddings, index_options)
+    builder.add(texts, vectors, metadatas, ids)
+    return builder.build()
+
+
+def delete_from_faiss_index(faiss_db: FAISS, ids: List[str]) -> None:
+    """
+    Delete documents from an index. FAISS.delete renumbers index positions
+    as if the index was compacted, which only flat indices do: IVF indices
+    keep the ids of the remaining vectors and HNSW indices can't remove
+    vectors at all. The remaining vectors of those are therefore added to an
+    empty copy of the index, which keeps its trained centroids, so nothing
+    is re-embedded. Vectors of PQ indices are re-encoded from their
+    reconstructions.
+
+    :param faiss_db: index to delete the documents from
+    :type faiss_db: FAISS
+    :param ids: document ids to delete
+    :type ids: List[str]
+    """
+    if not ids:
+        return
+    if get_index_type(faiss_db.index) == "flat":
+        faiss_db.delete(ids)
+        return
+
+    faiss = dependable_faiss_import()
+    deleted_ids = set(ids)
+    missing_ids = deleted_ids.difference(faiss_db.index_to_docstore_id.values())
+    if missing_ids:
+        raise ValueError(f"Some specified ids do not exist: {missing_ids}")
+
+    kept = [
+        (position, doc_id)
+        for position, doc_id in sorted(faiss_db.index_to_docstore_id.items())
+        if doc_id not in deleted_ids
+    ]
+    make_reconstructable(faiss_db.index)
+    vectors = faiss_db.index.reconstruct_n(0, faiss_db.index.ntotal)
+
+    index = faiss.clone_index(faiss_db.index)
+    index.reset()
+    if kept:
+        index.add(vectors[[position for position, _ in kept]])
+    faiss_db.index = index
+    faiss_db.docstore.delete(list(deleted_ids))
+    faiss_db.index_to_docstore_id = {
+        position: doc_id for position, (_, doc_id) in enumerate(kept)
+    }
+
+
+def load_faiss_index(
+    embedding_path: str,
+    embeddings: Embeddings,
+    mmap: bool = False,
+    index_options: Optional[Dict[str, Any]] = None,
+) -> FAISS:
+    """
+    Load a saved index. In mmap mode the index is opened with IO_FLAG_MMAP
+    and documents are read from the SQLite docstore, so several processes
+    share the OS page cache instead of holding their own copies. FAISS only
+    memory-maps the inverted lists of IVF indices, flat and HNSW indices are
+    still read fully into memory. Indices saved without a SQLite docstore are
+    loaded fully. Vectors of loaded indices can be reconstructed by position.
+
+    :param embedding_path: directory of the index
+    :type embedding_path: str
+    :param embeddings: embeddings used to embed queries
+    :type embeddings: Embeddings
+    :param mmap: memory-map the index
+    :type mmap: bool
+    :param index_options: index options of the vector store config, search
+        parameters (nprobe, ef_search) are applied to the loaded index
+    :type index_options: Optional[Dict[str, Any]]
+    :return: loaded index
+    :rtype: FAISS
+    """
+    docstore_path = os.path.join(embedding_path, DOCSTORE_FILE_NAME)
+    if not mmap or not os.path.exists(docstore_path):
+        faiss_db = FAISS.load_local(embedding_path, embeddings)
+    else:
+        faiss = dependable_faiss_import()
+        index = faiss.read_index(
+            os.path.join(embedding_path, "index.faiss"),
+            faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+        )
+        docstore = SQLiteDocstore(docstore_path)
+        faiss_db = FAISS(embeddings, index, docstore, SQLiteIndexToDocstoreId(docstore))
+
+    set_search_parameters(faiss_db.index, index_options or {})
+    # loaded indices are shared by threads, so IVF direct maps (vectors by
+    # position) are built once here rather than on first reconstruct
+    make_reconstructable(faiss_db.index)
+    return faiss_db
@@ -1,12 +1,41 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
 import os
-from typing import List, Tuple
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+import weakref
 
-from langchain_community.vectorstores.faiss import FAISS
-import tiktoken
+from langchain_core.documents import Document
+import numpy as np
 
 from task_whisperer.src.embedding.base import BaseEmbeddings
+from task_whisperer.src.embedding.batching import get_n_tokens
+from task_whisperer.src.vector_store.bm25 import (
+    BM25Index,
+    get_identifier_ratio,
+    load_bm25_index,
+    reciprocal_rank_fusion,
+)
+from task_whisperer.src.vector_store.cache import (
+    FaissIndexCache,
+    get_faiss_index_cache,
+)
+from task_whisperer.src.vector_store.faiss_io import load_faiss_index
+from task_whisperer.src.vector_store.neighbours import (
+    NEIGHBOURS_FILE_NAME,
+    compute_neighbours,
+    get_index_keys,
+    get_key_positions,
+    load_neighbours,
+    merge_neighbours,
+    save_neighbours,
+)
 
 EMBEDDING_MODEL = "text-embedding-ada-002"
+MAX_SEARCH_WORKERS = 8
+RETRIEVAL_MODES = ("vector", "hybrid")
 
 
 class FaissVectorStore:
@@ -15,35 +44,306 @@ class FaissVectorStore:
     kind = "faiss"
 
     def __init__(
-        self, faiss_index_root_path: str, embedding_generator: BaseEmbeddings
+        self,
+        faiss_index_root_path: str,
+        embedding_generator: BaseEmbeddings,
+        index_cache: Optional[FaissIndexCache] = None,
+        mmap: bool = False,
+        index_options: Optional[Dict[str, Any]] = None,
+        retrieval_options: Optional[Dict[str, Any]] = None,
     ) -> None:
         assert faiss_index_root_path, "faiss_index_root_path is required"
+        retrieval_options = retrieval_options or {}
+        self.retrieval_mode = retrieval_options.get("mode", "vector")
+        assert (
+            self.retrieval_mode in RETRIEVAL_MODES
+        ), f"retrieval mode must be one of {RETRIEVAL_MODES}"
         self.faiss_index_root_path = faiss_index_root_path
         self.embedding_generator = embedding_generator
+        self.index_cache = index_cache or get_faiss_index_cache()
+        self.mmap = mmap
+        self.index_options = index_options or {}
+        self.lexical_fast_path = retrieval_options.get("lexical_fast_path", True)
+        self.min_identifier_ratio = retrieval_options.get("min_identifier_ratio", 0.5)
+        self.n_candidates = retrieval_options.get("n_candidates", 50)
+        self.rrf_k = retrieval_options.get("rrf_k", 60)
+        # issue keys of the loaded indices, dropped with their evicted index
+        self._index_keys: "weakref.WeakKeyDictionary[Any, Tuple]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._index_keys_lock = threading.Lock()
 
     def _get_embedding_path(self, project: str) -> str:
-        embedding_model = self.embedding_generator.embedding_model
-        return os.path.join(
-            self.faiss_index_root_path,
-            "openai",
-            f"faiss_index_{project}_{embedding_model}",
+        # indices are where the embedding generator of their backend saves them
+        return self.embedding_generator.get_embedding_path(project)
+
+    def has_index(self, project: str) -> bool:
+        return os.path.exists(
+            os.path.join(self._get_embedding_path(project), "index.faiss")
         )
 
     def get_n_tokens(self, query: str) -> int:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(query))
+        return get_n_tokens(query)
 
     def read_vector_index(self, project: str):
         embedding_path = self._get_embedding_path(project)
-        faiss_db = FAISS.load_local(
-            embedding_path, self.embedding_generator.embedding_model
+        faiss_db = self.index_cache.get(
+            embedding_path,
+            lambda: load_faiss_index(
+                embedding_path,
+                self.embedding_generator.embedder,
+                mmap=self.mmap,
+                index_options=self.index_options,
+            ),
         )
         return faiss_db
 
+    def read_bm25_index(self, project: str) -> Optional[BM25Index]:
+        embedding_path = self._get_embedding_path(project)
+        return self.index_cache.get(
+            embedding_path, lambda: load_bm25_index(embedding_path), kind="bm25"
+        )
+
+    def read_neighbours(
+        self, project: str
+    ) -> Optional[Dict[str, List[Tuple[str, float]]]]:
+        embedding_path = self._get_embedding_path(project)
+        return self.index_cache.get(
+            embedding_path, lambda: load_neighbours(embedding_path), kind="neighbours"
+        )
+
+    def _get_index_keys(
+        self, faiss_db
+    ) -> Tuple[List[Optional[str]], Dict[str, List[int]]]:
+        """Issue keys of the vectors of an index and positions of each key"""
+        with self._index_keys_lock:
+            index_keys = self._index_keys.get(faiss_db)
+        if index_keys is None:
+            keys = get_index_keys(faiss_db)
+            index_keys = (keys, get_key_positions(keys))
+            with self._index_keys_lock:
+                self._index_keys[faiss_db] = index_keys
+        return index_keys
+
+    def similar_issues_by_key(
+        self, project: str, key: str, n_similar: int = 5
+    ) -> List[Document]:
+        """
+        Similar tasks of an issue already in the index of a project. Nothing
+        is embedded: precomputed neighbours are used if they were saved with
+        the index, otherwise the index is searched with the stored vectors
+        of the issue. Chunks of the issue itself are never returned.
+
+        :param project: project key
+        :type project: str
+        :param key: issue key, e.g. PROJ-123
+        :type key: str
+        :param n_similar: number of similar tasks
+        :type n_similar: int
+        :raises KeyError: if the issue is not in the index
+        :return: documents of the similar tasks, most similar first
+        :rtype: List[Document]
+        """
+        faiss_db = self.read_vector_index(project)
+        neighbours = self.read_neighbours(project)
+        if neighbours is not None and key in neighbours:
+            key_neighbours = neighbours[key]
+            # less neighbours than asked are enough if every issue is one
+            if len(key_neighbours) >= min(n_similar, len(neighbours) - 1):
+                return self._get_documents(
+                    faiss_db, [doc_id for doc_id, _ in key_neighbours[:n_similar]]
+                )
+
+        keys, key_positions = self._get_index_keys(faiss_db)
+        positions = key_positions.get(key)
+        if not positions:
+            raise KeyError(key)
+
+        # direct maps of IVF indices are built by load_faiss_index
+        vectors = np.vstack(
+            [faiss_db.index.reconstruct(position) for position in positions]
+        )
+        # enough results to skip the chunks of the issue and of its neighbours
+        n_search = min((n_similar + 1) * len(positions), faiss_db.index.ntotal)
+        distances, result_positions = faiss_db.index.search(vectors, n_search)
+        key_neighbours = merge_neighbours(
+            faiss_db,
+            keys,
+            [key] * len(positions),
+            distances,
+            result_positions,
+            n_similar,
+        )[key]
+        return self._get_documents(faiss_db, [doc_id for doc_id, _ in key_neighbours])
+
+    def build_neighbours(self, project: str, k: int = 10) -> str:
+        """
+        Precompute the k nearest issues of every issue of a project and save
+        them next to its index, for lookups by issue key without a search.
+
+        :return: path of the saved neighbours
+        :rtype: str
+        """
+        faiss_db = self.read_vector_index(project)
+        neighbours_path = os.path.join(
+            self._get_embedding_path(project), NEIGHBOURS_FILE_NAME
+        )
+        save_neighbours(compute_neighbours(faiss_db, k), neighbours_path)
+        return neighbours_path
+
+    def _is_lexical_query(self, query: str) -> bool:
+        """Queries mostly made of issue keys or identifiers skip embedding"""
+        return (
+            self.lexical_fast_path
+            and get_identifier_ratio(query) >= self.min_identifier_ratio
+        )
+
+    @staticmethod
+    def _get_documents(faiss_db, doc_ids: List[str]) -> List[Document]:
+        docs = [faiss_db.docstore.search(doc_id) for doc_id in doc_ids]
+        return [doc for doc in docs if isinstance(doc, Document)]
+
+    def _lexical_search(
+        self, project: str, query: str, n_similar: int
+    ) -> Tuple[List[str], bool]:
+        """
+        Document ids of similar tasks of a query mostly made of identifiers
+        by BM25 only, and whether they fill every slot so that the query
+        needs no embedding. Other queries have no lexical results.
+        """
+        if not self._is_lexical_query(query):
+            return [], False
+        bm25_index = self.read_bm25_index(project)
+        if bm25_index is None:
+            return [], False
+        doc_ids = [doc_id for doc_id, _ in bm25_index.search(query, n_similar)]
+        n_docs = self.read_vector_index(project).index.ntotal
+        return doc_ids, len(doc_ids) >= min(n_similar, n_docs)
+
+    def _read_retrieval_bm25_index(self, project: str) -> Optional[BM25Index]:
+        """BM25 index fused with vector search, None in vector mode"""
+        if self.retrieval_mode != "hybrid":
+            return None
+        return self.read_bm25_index(project)
+
+    def _get_n_search(self, bm25_index: Optional[BM25Index], n_similar: int) -> int:
+        """Number of vectors searched for n_similar results"""
+        if bm25_index is None:
+            return n_similar
+        return max(n_similar, self.n_candidates)
+
+    def _rank(
+        self,
+        faiss_db,
+        bm25_index: Optional[BM25Index],
+        query: str,
+        distances: np.ndarray,
+        positions: np.ndarray,
+        n_similar: int,
+        exclude: Set[str],
+    ) -> List[Tuple[str, float]]:
+        """
+        Rank the results of a vector search, fused with the BM25 ranking of
+        the query with Reciprocal Rank Fusion when a BM25 index is given.
+
+        :param faiss_db: searched index
+        :type faiss_db: FAISS
+        :param bm25_index: BM25 index of the project, None in vector mode
+        :type bm25_index: Optional[BM25Index]
+        :param query: query text for BM25
+        :type query: str
+        :param distances: distances of a row of the vector search
+        :type distances: np.ndarray
+        :param positions: positions of a row of the vector search
+        :type positions: np.ndarray
+        :param n_similar: number of results
+        :type n_similar: int
+        :param exclude: document ids which are not ranked
+        :type exclude: Set[str]
+        :return: (document id, score) pairs, highest score first. Scores are
+            negated L2 distances in vector mode and RRF scores in hybrid mode.
+        :rtype: List[Tuple[str, float]]
+        """
+        ranking = [
+            (faiss_db.index_to_docstore_id[position], -float(distance))
+            for distance, position in zip(distances, positions)
+            if position != -1
+        ]
+        if bm25_index is not None:
+            n_candidates = self._get_n_search(bm25_index, n_similar + len(exclude))
+            lexical_ranking = [
+                doc_id for doc_id, _ in bm25_index.search(query, n_candidates)
+            ]
+            ranking = reciprocal_rank_fusion(
+                [[doc_id for doc_id, _ in ranking], lexical_ranking], self.rrf_k
+            )
+        return [(doc_id, score) for doc_id, score in ranking if doc_id not in exclude][
+            :n_similar
+        ]
+
+    def _search(
+        self,
+        project: str,
+        queries: List[str],
+        task_embeds: np.ndarray,
+        n_similar: int,
+        lexical_ids: List[List[str]],
+    ) -> List[List[Document]]:
+        """
+        Search similar tasks of queries with one FAISS search, by vector or
+        by fusing vector and BM25 rankings in hybrid mode. Documents found by
+        the lexical fast path of a query come first, and the search fills
+        the remaining slots.
+
+        :param project: project key
+        :type project: str
+        :param queries: query texts for BM25
+        :type queries: List[str]
+        :param task_embeds: query embeddings, a row per query
+        :type task_embeds: np.ndarray
+        :param n_similar: number of similar tasks per query
+        :type n_similar: int
+        :param lexical_ids: document ids found by BM25 only, of each query
+        :type lexical_ids: List[List[str]]
+        :return: documents of the similar tasks of each query, most similar
+            first
+        :rtype: List[List[Document]]
+        """
+        faiss_db = self.read_vector_index(project)
+        bm25_index = self._read_retrieval_bm25_index(project)
+        n_search = self._get_n_search(
+            bm25_index, n_similar + max(len(doc_ids) for doc_ids in lexical_ids)
+        )
+        distances, positions = faiss_db.index.search(task_embeds, n_search)
+
+        similar_tasks = []
+        for query, doc_ids, row_distances, row_positions in zip(
+            queries, lexical_ids, distances, positions
+        ):
+            ranking = self._rank(
+                faiss_db,
+                bm25_index,
+                query,
+                row_distances,
+                row_positions,
+                n_similar - len(doc_ids),
+                set(doc_ids),
+            )
+            similar_tasks.append(
+                self._get_documents(
+                    faiss_db, doc_ids + [doc_id for doc_id, _ in ranking]
+                )
+            )
+        return similar_tasks
+
+    @staticmethod
+    def _get_task_def(task_summary: str, task_desc: str = "") -> str:
+        return f"Summary: {task_summary}\nDescription: {task_desc}"
+
     def get_embedding(
         self, task_summary: str, task_desc: str = ""
     ) -> Tuple[List[float], int]:
-        task_def = f"Summary: {task_summary}\nDescription: {task_desc}"
+        task_def = self._get_task_def(task_summary, task_desc)
         n_tokens = self.get_n_tokens(task_def)
         embedded = self.embedding_generator.embed_query(task_def)
         return embedded, n_tokens
@@ -54,13 +354,203 @@ class FaissVectorStore:
         task_summary: str,
         task_desc: str = "",
         n_similar: int = 5,
-    ) -> Tuple[List[str], int]:
-        faiss_db = self.read_vector_index(project)
+    ) -> Tuple[List[Document], int]:
+        """
+        Search similar tasks of a task in the index of a project. Queries
+        mostly made of issue keys or identifiers are answered from the BM25
+        index without embedding the query, n_tokens is 0 then. When BM25
+        finds fewer than n_similar tasks, the query is embedded and the
+        search fills the remaining slots.
+
+        :return: documents of the similar tasks, most similar first, and
+            query token count
+        :rtype: Tuple[List[Document], int]
+        """
+        query = f"{task_summary} {task_desc}".strip()
+        lexical_ids, is_complete = self._lexical_search(project, query, n_similar)
+        if is_complete:
+            return self._get_documents(self.read_vector_index(project), lexical_ids), 0
+
+        task_embed, n_tokens = self.get_embedding(task_summary, task_desc)
+        similar_tasks = self._search(
+            project,
+            [query],
+            np.asarray([task_embed], dtype=np.float32),
+            n_similar,
+            [lexical_ids],
+        )
+        return similar_tasks[0], n_tokens
+
+    def similarity_search_multi(
+        self,
+        projects: List[str],
+        task_summary: str,
+        task_desc: str = "",
+        n_similar: int = 5,
+        max_workers: int = MAX_SEARCH_WORKERS,
+    ) -> Tuple[List[Document], int]:
+        """
+        Similarity search over the indices of many projects. The query is
+        embedded once, indices are searched in parallel (FAISS releases the
+        GIL while searching) and their top-k results are merged by distance,
+        or by RRF score in hybrid mode. Projects without an index are
+        skipped. There is no lexical fast path, as BM25 scores of different
+        indices are not comparable and the query is embedded once anyway.
+
+        :param projects: project keys
+        :type projects: List[str]
+        :param task_summary: task summary to search similar tasks for
+        :type task_summary: str
+        :param task_desc: task description
+        :type task_desc: str
+        :param n_similar: number of similar tasks in total
+        :type n_similar: int
+        :param max_workers: maximum number of indices searched at once
+        :type max_workers: int
+        :return: documents of the similar tasks of all projects, most similar
+            first, and query token count
+        :rtype: Tuple[List[Document], int]
+        """
+        query = f"{task_summary} {task_desc}".strip()
         task_embed, n_tokens = self.get_embedding(task_summary, task_desc)
-        similar_questions = faiss_db.similarity_search_by_vector(
-            task_embed, k=n_similar
+        task_embeds = np.asarray([task_embed], dtype=np.float32)
+        projects = [project for project in projects if self.has_index(project)]
+        if not projects:
+            return [], n_tokens
+
+        def _search(project: str) -> List[Tuple[Document, float]]:
+            faiss_db = self.read_vector_index(project)
+            bm25_index = self._read_retrieval_bm25_index(project)
+            distances, positions = faiss_db.index.search(
+                task_embeds, self._get_n_search(bm25_index, n_similar)
+            )
+            ranking = self._rank(
+                faiss_db,
+                bm25_index,
+                query,
+                distances[0],
+                positions[0],
+                n_similar,
+                set(),
+            )
+            return [
+                (faiss_db.docstore.search(doc_id), score) for doc_id, score in ranking
+            ]
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(projects))
+        ) as executor:
+            partial_results = list(executor.map(_search, projects))
+
+        # scores are negated L2 distances or RRF scores, higher is more similar
+        merged = heapq.nlargest(
+            n_similar,
+            (
+                (doc, score)
+                for doc, score in itertools.chain.from_iterable(partial_results)
+                if isinstance(doc, Document)
+            ),
+            key=lambda doc_score: doc_score[1],
+        )
+        return [doc for doc, _ in merged], n_tokens
+
+    async def aget_embedding(
+        self, task_summary: str, task_desc: str = ""
+    ) -> Tuple[List[float], int]:
+        task_def = self._get_task_def(task_summary, task_desc)
+        n_tokens = self.get_n_tokens(task_def)
+        embedded = await self.embedding_generator.aembed_query(task_def)
+        return embedded, n_tokens
+
+    async def asimilarity_search(
+        self,
+        project: str,
+        task_summary: str,
+        task_desc: str = "",
+        n_similar: int = 5,
+    ) -> Tuple[List[Document], int]:
+        """
+        Async counterpart of similarity_search. The query is embedded while
+        the index is read, reading and searching the index run in worker
+        threads as FAISS calls are blocking.
+        """
+        query = f"{task_summary} {task_desc}".strip()
+        lexical_ids, is_complete = [], False
+        if self._is_lexical_query(query):
+            lexical_ids, is_complete = await asyncio.to_thread(
+                self._lexical_search, project, query, n_similar
+            )
+        if is_complete:
+            faiss_db = await asyncio.to_thread(self.read_vector_index, project)
+            return self._get_documents(faiss_db, lexical_ids), 0
+
+        _, (task_embed, n_tokens) = await asyncio.gather(
+            asyncio.to_thread(self.read_vector_index, project),
+            self.aget_embedding(task_summary, task_desc),
+        )
+        similar_tasks = await asyncio.to_thread(
+            self._search,
+            project,
+            [query],
+            np.asarray([task_embed], dtype=np.float32),
+            n_similar,
+            [lexical_ids],
         )
-        similar_questions = [
-            similar_question.page_content for similar_question in similar_questions
+        return similar_tasks[0], n_tokens
+
+    def similarity_search_batch(
+        self,
+        project: str,
+        task_summaries: List[str],
+        n_similar: int = 5,
+    ) -> Tuple[List[List[Document]], List[int]]:
+        """
+        Similarity search for many task summaries at once, with the retrieval
+        mode and lexical fast path of similarity_search. Summaries which are
+        not answered by the lexical fast path are embedded in a single
+        batched call and searched with one FAISS search.
+
+        :param project: project key
+        :type project: str
+        :param task_summaries: task summaries to search similar tasks for
+        :type task_summaries: List[str]
+        :param n_similar: number of similar tasks per summary
+        :type n_similar: int
+        :return: documents of the similar tasks and query token count of each
+            summary
+        :rtype: Tuple[List[List[Document]], List[int]]
+        """
+        faiss_db = self.read_vector_index(project)
+        lexical_results = [
+            self._lexical_search(project, task_summary.strip(), n_similar)
+            for task_summary in task_summaries
+        ]
+        similar_tasks = [
+            self._get_documents(faiss_db, lexical_ids)
+            for lexical_ids, _ in lexical_results
+        ]
+        n_tokens = [0] * len(task_summaries)
+
+        # summaries answered by BM25 alone are not embedded
+        positions = [
+            i for i, (_, is_complete) in enumerate(lexical_results) if not is_complete
         ]
-        return similar_questions, n_tokens
+        if not positions:
+            return similar_tasks, n_tokens
+
+        task_defs = [self._get_task_def(task_summaries[i]) for i in positions]
+        task_embeds = np.asarray(
+            self.embedding_generator.embed_queries(task_defs), dtype=np.float32
+        )
+        searched_tasks = self._search(
+            project,
+            [task_summaries[i].strip() for i in positions],
+            task_embeds,
+            n_similar,
+            [lexical_results[i][0] for i in positions],
+        )
+        for i, task_def, docs in zip(positions, task_defs, searched_tasks):
+            similar_tasks[i] = docs
+            n_tokens[i] = self.get_n_tokens(task_def)
+
+        return similar_tasks, n_tokens
@@ -0,0 +1,159 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from langchain_community.vectorstores.faiss import FAISS, dependable_faiss_import
+from langchain_core.documents import Document
+import numpy as np
+
+NEIGHBOURS_FILE_NAME = "neighbours.json"
+
+
+def make_reconstructable(index) -> None:
+    """IVF indices can only reconstruct vectors by position with a direct map"""
+    faiss = dependable_faiss_import()
+    index_ivf = faiss.try_extract_index_ivf(index)
+    if index_ivf is not None and index_ivf.direct_map.no():
+        index_ivf.make_direct_map()
+
+
+def get_index_vectors(faiss_db: FAISS) -> np.ndarray:
+    """
+    Stored vectors of an index, in index position order. Vectors of PQ
+    indices are approximate reconstructions.
+    """
+    make_reconstructable(faiss_db.index)
+    return faiss_db.index.reconstruct_n(0, faiss_db.index.ntotal)
+
+
+def get_index_keys(faiss_db: FAISS) -> List[Optional[str]]:
+    """Issue keys of the vectors of an index, in index position order"""
+    keys = []
+    for position in range(faiss_db.index.ntotal):
+        doc = faiss_db.docstore.search(faiss_db.index_to_docstore_id[position])
+        keys.append(doc.metadata.get("key") if isinstance(doc, Document) else None)
+    return keys
+
+
+def get_key_positions(keys: List[Optional[str]]) -> Dict[str, List[int]]:
+    """Index positions of the chunks of each issue key"""
+    key_positions: Dict[str, List[int]] = {}
+    for position, key in enumerate(keys):
+        if key is not None:
+            key_positions.setdefault(key, []).append(position)
+    return key_positions
+
+
+def merge_neighbours(
+    faiss_db: FAISS,
+    keys: List[Optional[str]],
+    query_keys: List[str],
+    distances: np.ndarray,
+    positions: np.ndarray,
+    k: int,
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Merge search results of chunks into the nearest issues of each issue.
+    Chunks of the issue itself are skipped, an issue found by several chunks
+    is kept with its closest chunk.
+
+    :param faiss_db: searched index
+    :type faiss_db: FAISS
+    :param keys: issue keys of the vectors of the index by position
+    :type keys: List[Optional[str]]
+    :param query_keys: issue key of each searched chunk
+    :type query_keys: List[str]
+    :param distances: search distances, one row per searched chunk
+    :type distances: np.ndarray
+    :param positions: search results, one row per searched chunk
+    :type positions: np.ndarray
+    :param k: number of nearest issues per issue
+    :type k: int
+    :return: (document id, distance) of the nearest issues by issue key,
+        closest first
+    :rtype: Dict[str, List[Tuple[str, float]]]
+    """
+    nearest: Dict[str, Dict[str, Tuple[float, int]]] = {}
+    for query_key, row_distances, row_positions in zip(
+        query_keys, distances, positions
+    ):
+        key_nearest = nearest.setdefault(query_key, {})
+        for distance, position in zip(row_distances.tolist(), row_positions.tolist()):
+            key = keys[position] if position != -1 else None
+            if key is None or key == query_key:
+                continue
+            if key not in key_nearest or distance < key_nearest[key][0]:
+                key_nearest[key] = (distance, position)
+
+    return {
+        query_key: [
+            (faiss_db.index_to_docstore_id[position], distance)
+            for distance, position in sorted(key_nearest.values())[:k]
+        ]
+        for query_key, key_nearest in nearest.items()
+    }
+
+
+def compute_neighbours(
+    faiss_db: FAISS, k: int = 10, batch_size: int = 1024
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Nearest issues of every issue of an index, searched with the stored
+    vectors in batches, so that no text is embedded.
+
+    :param faiss_db: index of a project
+    :type faiss_db: FAISS
+    :param k: number of nearest issues per issue
+    :type k: int
+    :param batch_size: number of issues searched at once
+    :type batch_size: int
+    :return: (document id, distance) of the nearest issues by issue key,
+        closest first
+    :rtype: Dict[str, List[Tuple[str, float]]]
+    """
+    assert k > 0, "k must be positive"
+    keys = get_index_keys(faiss_db)
+    key_positions = get_key_positions(keys)
+    if not key_positions:
+        return {}
+
+    n_chunks = max(len(positions) for positions in key_positions.values())
+    vectors = get_index_vectors(faiss_db)
+    # enough results to skip the chunks of the issue and of its neighbours
+    n_search = min((k + 1) * n_chunks, faiss_db.index.ntotal)
+
+    neighbours: Dict[str, List[Tuple[str, float]]] = {}
+    key_items = list(key_positions.items())
+    # chunks of an issue are searched in the same batch
+    for start in range(0, len(key_items), batch_size):
+        batch_keys, batch_positions = [], []
+        for key, positions in key_items[start : start + batch_size]:
+            batch_keys.extend([key] * len(positions))
+            batch_positions.extend(positions)
+
+        distances, positions = faiss_db.index.search(vectors[batch_positions], n_search)
+        neighbours.update(
+            merge_neighbours(faiss_db, keys, batch_keys, distances, positions, k)
+        )
+
+    return neighbours
+
+
+def save_neighbours(
+    neighbours: Dict[str, List[Tuple[str, float]]], neighbours_path: str
+) -> None:
+    tmp_path = f"{neighbours_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(neighbours, f)
+    os.replace(tmp_path, neighbours_path)
+
+
+def load_neighbours(
+    embedding_path: str,
+) -> Optional[Dict[str, List[Tuple[str, float]]]]:
+    """Precomputed neighbours of an index, None if they weren't computed"""
+    neighbours_path = os.path.join(embedding_path, NEIGHBOURS_FILE_NAME)
+    if not os.path.exists(neighbours_path):
+        return None
+    with open(neighbours_path, "r") as f:
+        return json.load(f)
@@ -24,6 +24,7 @@ if __name__ == "__main__":
         - 🚀 Generate Embeddings from Issue Descriptions to prepare for LLM-based task generation.
         - 🔮 Input a task summary and watch the magic happen with a single click!
         - 📝 Review and edit generated task descriptions and submit to ITS with a single click!
+        - 🔎 Find clusters of near-duplicate issues of a project.
         """
     )
 
@@ -39,5 +40,6 @@ if __name__ == "__main__":
         icon="🔮",
     )
     st.page_link("pages/4_create_task.py", label="Create Task", icon="🚀")
+    st.page_link("pages/5_find_duplicates.py", label="Find Duplicates", icon="🔎")
 
     sidebar_config = render_sidebar()
@@ -5,6 +5,7 @@ import streamlit as st
 from task_whisperer import CONFIG
 from task_whisperer.src.steamlit_helpers.sidebar import render_sidebar
 from task_whisperer.src.page_helpers.issues import IssueService
+from task_whisperer.src.page_helpers.pipeline import ProjectPipeline
 
 
 class IssueFetchRenderer:
@@ -31,6 +32,11 @@ class IssueFetchRenderer:
             f"for the selected projects:"
         )
         st.markdown(f"{self.its_config['projects']}")
+        incremental = st.checkbox(
+            "Incremental sync",
+            value=True,
+            help="Only fetch issues updated since the last fetch of each project.",
+        )
         submitted = st.button("Fetch 🔽", type="primary")
         if not submitted:
             return
@@ -38,16 +44,28 @@ class IssueFetchRenderer:
         can_fetch_issues, missing_values = self.can_fetch()
 
         if can_fetch_issues:
-            project_names = ",".join(self.projects)
-            with st.spinner(f"Fetching issues for {project_names}. Please wait..."):
-                issue_list_by_project = self.issue_service.fetch_issues(self.projects)
-
-                info_text = "Obtained issues successfully! 🎉 \n"
-                for project, issues in issue_list_by_project.items():
-                    info_text += f"{project}: {len(issues)}\n"
-
+            pipeline = ProjectPipeline(issue_service=self.issue_service)
+            progress_bars = {
+                project: st.progress(0.0, text=f"{project}: pending")
+                for project in self.projects
+            }
+
+            info_text = "Obtained issues successfully! 🎉 \n"
+            n_done = 0
+            for status in pipeline.run(
+                self.projects, stages=("fetch",), incremental=incremental
+            ):
+                progress_bars[status.project].progress(
+                    status.progress, text=f"{status.project}: {status.stage}"
+                )
+                if status.state == "done":
+                    n_done += 1
+                    info_text += f"{status.project}: {status.issue_count}\n"
+                elif status.state == "failed":
+                    st.error(f"Fetching {status.project} failed: {status.error}")
+
+            if n_done:
                 st.success(info_text)
-                self.issue_service.save_issues(issue_list_by_project)
         else:
             for value in missing_values:
                 st.warning(f"'{value}' is required but it is missing!", icon="⚠️")
@@ -5,6 +5,7 @@ import streamlit as st
 from task_whisperer.src.page_helpers.generate_embeddings import (
     GenerateEmbeddingsService,
 )
+from task_whisperer.src.page_helpers.pipeline import ProjectPipeline
 from task_whisperer.src.steamlit_helpers.sidebar import render_sidebar
 
 
@@ -20,21 +21,37 @@ class GenerateEmbeddingsRenderer:
             self.llm_kind, self.its_kind, self.llm_config
         )
 
-    def generate_embeddings(self) -> None:
-        embeddings_paths = {}
-        for project in self.projects:
-            embeddings_path = self.generate_embeddings_service.create_embeddings(
-                project
+    def generate_embeddings(self, incremental: bool = False) -> bool:
+        pipeline = ProjectPipeline(embeddings_service=self.generate_embeddings_service)
+        progress_bars = {
+            project: st.progress(0.0, text=f"{project}: pending")
+            for project in self.projects
+        }
+
+        all_done = True
+        for status in pipeline.run(
+            self.projects, stages=("embed",), incremental=incremental
+        ):
+            progress_bars[status.project].progress(
+                status.progress,
+                text=f"{status.project}: {status.progress:.0%} embedded",
             )
-            embeddings_paths[project] = embeddings_path
+            if status.state == "failed":
+                all_done = False
+                st.error(f"Embedding {status.project} failed: {status.error}")
 
-        self.generate_embeddings_service.save_embeddings_paths(embeddings_paths)
+        return all_done
 
     def render_embedding_generation_layout(self) -> None:
         st.markdown("### Click Generate Embeddings button to create embeddings")
         project_names = ",".join(self.projects)
         st.markdown(f"**Projects: {project_names}**")
         st.markdown("A separate embedding index will be created for each project.")
+        incremental = st.checkbox(
+            "Incremental update",
+            value=True,
+            help="Only embed new or changed issues and update existing indices.",
+        )
         submitted = st.button("Generate Embeddings 🚀", type="primary")
         if submitted:
             if not self.llm_config["api_key"]:
@@ -51,8 +68,8 @@ class GenerateEmbeddingsRenderer:
                 f"Generating {self.llm_kind} embeddings for {project_names}. "
                 "Please wait..."
             ):
-                self.generate_embeddings()
-                st.success("Embeddings generated successfully! 🎉")
+                if self.generate_embeddings(incremental=incremental):
+                    st.success("Embeddings generated successfully! 🎉")
 
     def render_page_container(self) -> None:
         with st.container(border=True):
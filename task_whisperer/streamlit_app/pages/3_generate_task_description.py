@@ -1,13 +1,14 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
 import streamlit as st
 
 from task_whisperer.src.steamlit_helpers.sidebar import render_sidebar
 from task_whisperer.src.page_helpers.generate_task_description import (
-    create_task_description,
+    stream_task_description,
 )
 
 STAGE_NAME = "3_generate_task_description_stage"
+ALL_PROJECTS = "All projects"
 
 
 class GenerateTaskDescriptionRenderer:
@@ -24,24 +25,32 @@ class GenerateTaskDescriptionRenderer:
         task_summary = st.text_area("Task Summary", "")
         return task_summary
 
-    def render_project_selection(self) -> str:
+    def render_project_selection(self) -> Union[str, List[str]]:
         st.markdown("### Project")
-        project = st.selectbox("Select Project", self.projects)
+        options = self.projects
+        if len(self.projects) > 1:
+            options = self.projects + [ALL_PROJECTS]
+        project = st.selectbox("Select Project", options)
+        # similar tasks are searched in every project
+        if project == ALL_PROJECTS:
+            return self.projects
         return project
 
-    def render_task_description_layout(self, task_summary: str, project: str):
-        with st.spinner(f"Generating Task description. Please wait..."):
+    def render_task_description_layout(
+        self, task_summary: str, project: Union[str, List[str]]
+    ):
+        with st.spinner(f"Searching similar tasks. Please wait..."):
             # task_response = {
-            #     "answer": "This is a task description",
+            #     "answer_stream": iter(["This is ", "a task description"]),
             #     "similar_tasks": [
             #         "Summary: Summary 1\nDescription: Description 1",
             #         "Summary: Summary 2\nDescription: Description 2",
             #     ]
             # }
-            task_response = create_task_description(
+            task_response = stream_task_description(
                 self.llm_kind, self.llm_config, task_summary, project
             )
-            return self.render_task_description_output(task_summary, task_response)
+        return self.render_task_description_output(task_summary, task_response)
 
     def render_task_description_output(
         self,
@@ -50,11 +59,7 @@ class GenerateTaskDescriptionRenderer:
     ):
         with st.container(border=True):
             col1, col2 = st.columns([0.6, 0.4])
-            with col1:
-                st.markdown(f"#### Task Summary: {task_summary}")
-                st.markdown(f"#### Task Description")
-                st.markdown(task_response["answer"])
-
+            # similar tasks are rendered first, the answer is streamed after
             with col2:
                 if task_response.get("similar_tasks"):
                     st.markdown("### Similar Tasks")
@@ -68,9 +73,18 @@ class GenerateTaskDescriptionRenderer:
                         if i < len(task_response["similar_tasks"]) - 1:
                             st.divider()
 
-        return task_response["answer"]
+            with col1:
+                st.markdown(f"#### Task Summary: {task_summary}")
+                st.markdown(f"#### Task Description")
+                if "answer_stream" in task_response:
+                    answer = st.write_stream(task_response["answer_stream"])
+                else:
+                    answer = task_response["answer"]
+                    st.markdown(answer)
+
+        return answer
 
-    def render_task_summary_form(self, project: str) -> Optional[str]:
+    def render_task_summary_form(self, project: Union[str, List[str]]) -> Optional[str]:
         task_summary = self.render_task_summary_input()
 
         def _on_create_task_description_click():
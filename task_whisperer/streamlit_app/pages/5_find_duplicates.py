@@ -0,0 +1,75 @@
+from typing import Any, Dict
+
+import streamlit as st
+
+from task_whisperer.src.page_helpers.duplicates import (
+    DUPLICATES_CONFIG,
+    DuplicateService,
+)
+from task_whisperer.src.steamlit_helpers.sidebar import render_sidebar
+
+
+class FindDuplicatesRenderer:
+    def __init__(self, its_config: Dict[str, Any], llm_config: Dict[str, Any]):
+        self.its_config = its_config
+        self.llm_config = llm_config
+        self.its_kind = self.its_config["selected_its"]
+        self.llm_kind = self.llm_config["selected_llm"]
+        self.projects = self.its_config["projects"].split(",")
+        self.projects = [p for p in self.projects if p]
+        self.duplicate_service = DuplicateService(
+            self.llm_kind, self.its_kind, self.llm_config
+        )
+
+    def render_page_container(self) -> None:
+        with st.container(border=True):
+            st.markdown("### Find near-duplicate issues of a project")
+            project = st.selectbox("Select Project", self.projects)
+            threshold = st.slider(
+                "Similarity Threshold",
+                min_value=0.5,
+                max_value=1.0,
+                value=float(DUPLICATES_CONFIG.get("threshold", 0.95)),
+                step=0.01,
+                help="Issues above this cosine similarity are duplicates.",
+            )
+            submitted = st.button("Find Duplicates 🔎", type="primary")
+
+        if not submitted:
+            return
+
+        if not project:
+            st.warning("A project should be selected.", icon="⚠️")
+            return
+
+        with st.spinner(f"Searching duplicates of {project}. Please wait..."):
+            try:
+                duplicates_df = self.duplicate_service.find_duplicates(
+                    project, threshold
+                )
+            except AssertionError as e:
+                st.warning(f"{e}. Please generate embeddings first.", icon="⚠️")
+                return
+
+        n_clusters = duplicates_df["cluster"].nunique()
+        st.markdown(
+            f"**{n_clusters} cluster(s) of {len(duplicates_df)} duplicate issues**"
+        )
+        st.dataframe(duplicates_df, use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download CSV",
+            duplicates_df.to_csv(index=False),
+            file_name=f"{project}_duplicates.csv",
+            mime="text/csv",
+        )
+
+
+if __name__ == "__main__":
+    st.set_page_config(page_title="Find Duplicates", page_icon="🔎", layout="wide")
+    sidebar_config = render_sidebar()
+    st.title("Find Duplicate Issues")
+
+    renderer = FindDuplicatesRenderer(
+        sidebar_config["its_config"], sidebar_config["llm_config"]
+    )
+    renderer.render_page_container()
@@ -0,0 +1,81 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import pytest
+
+from task_whisperer.src.vector_store.faiss_io import (
+    build_faiss_index,
+    delete_from_faiss_index,
+)
+
+DIMENSION = 16
+
+
+class RandomEmbeddings(Embeddings):
+    """Embeddings which are never called, vectors are given to the index"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> List[float]:
+        raise NotImplementedError
+
+
+@pytest.mark.parametrize(
+    "index_options",
+    [
+        {"type": "flat"},
+        {"type": "ivf_flat", "nlist": 4, "nprobe": 4},
+        {"type": "hnsw"},
+    ],
+)
+def test_delete_and_add(index_options):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, DIMENSION)).astype(np.float32)
+    ids = [f"P-{i}:0" for i in range(200)]
+    faiss_db = build_faiss_index(
+        [f"text {i}" for i in range(200)],
+        vectors.tolist(),
+        RandomEmbeddings(),
+        [{"key": f"P-{i}"} for i in range(200)],
+        ids,
+        index_options,
+    )
+
+    delete_from_faiss_index(faiss_db, ids[:10])
+    new_vectors = rng.normal(size=(5, DIMENSION)).astype(np.float32)
+    new_ids = [f"N-{i}:0" for i in range(5)]
+    faiss_db.add_embeddings(
+        zip([f"new text {i}" for i in range(5)], new_vectors.tolist()), ids=new_ids
+    )
+
+    assert faiss_db.index.ntotal == 195
+    assert sorted(faiss_db.index_to_docstore_id) == list(range(195))
+    assert set(faiss_db.index_to_docstore_id.values()) == set(ids[10:] + new_ids)
+
+    # every vector, including the last ones, is found as its own document
+    for vector, text in [
+        (vectors[199], "text 199"),
+        (vectors[10], "text 10"),
+        (new_vectors[0], "new text 0"),
+        (new_vectors[4], "new text 4"),
+    ]:
+        docs = faiss_db.similarity_search_by_vector(vector.tolist(), k=1)
+        assert docs[0].page_content == text
+
+    docs = faiss_db.similarity_search_by_vector(vectors[0].tolist(), k=195)
+    assert "text 0" not in [doc.page_content for doc in docs]
+
+
+def test_delete_unknown_ids():
+    faiss_db = build_faiss_index(
+        ["a"] * 200,
+        np.ones((200, DIMENSION), dtype=np.float32).tolist(),
+        RandomEmbeddings(),
+        [{} for _ in range(200)],
+        [str(i) for i in range(200)],
+        {"type": "ivf_flat", "nlist": 4},
+    )
+    with pytest.raises(ValueError):
+        delete_from_faiss_index(faiss_db, ["unknown"])